@@ -1,129 +1,436 @@
 import argparse
 import multiprocessing as mp
 import os
+import random
+import sys
 import time
 from multiprocessing.context import Process
+from pathlib import Path
+from typing import Dict, List, Optional
 
 import cv2
 from loguru import logger
 
-from text_renderer.config import get_cfg, GeneratorCfg
-from text_renderer.dataset import LmdbDataset, ImgDataset
+from text_renderer.config import RenderCfg, get_cfg
+from text_renderer.dataset import (
+    LmdbDataset,
+    ImgDataset,
+    MemmapDataset,
+    ShardedDataset,
+    TarDataset,
+)
 from text_renderer.render import Render
+from text_renderer.tasks import (
+    ReorderBuffer,
+    count_tasks,
+    interleave_tasks,
+    iter_tasks,
+)
+from text_renderer.transport import QueueTransport, ShmRingTransport, Transport
+from text_renderer.utils.errors import PanicError
+from text_renderer.utils.utils import seed_sample
 
 cv2.setNumThreads(1)
 
-STOP_TOKEN = "kill"
+# each child process will initialize these in process_setup
+render_cfgs: List[RenderCfg]
+# Render of each generator, created on first task of the generator
+renders: Dict[int, Render] = {}
+# transports[generator_idx][shard]
+transports: List[List[Transport]]
+dataset_cls = None
+seed: Optional[int] = None
+# images are encoded in render process with quality of the dataset
+jpg_quality: int = 95
 
-# each child process will initialize Render in process_setup
-render: Render
+# seconds to wait DBWriterProcess to flush after stop token
+WRITER_JOIN_TIMEOUT = 600
+# seconds between checks that DBWriterProcess of unfinished generators are alive
+WRITER_CHECK_PERIOD = 1
 
 
 class DBWriterProcess(Process):
     def __init__(
         self,
         dataset_cls,
-        data_queue,
-        generator_cfg: GeneratorCfg,
+        transport: Transport,
+        save_dir: Path,
+        num_image: int,
         log_period: float = 1,
+        dataset_kwargs: dict = None,
     ):
         super().__init__()
         self.dataset_cls = dataset_cls
-        self.data_queue = data_queue
-        self.generator_cfg = generator_cfg
+        self.dataset_kwargs = dataset_kwargs or {}
+        self.transport = transport
+        self.save_dir = save_dir
+        self.num_image = num_image
         self.log_period = log_period
 
     def run(self):
-        num_image = self.generator_cfg.num_image
-        save_dir = self.generator_cfg.save_dir
+        num_image = self.num_image
+        save_dir = self.save_dir
         log_period = max(1, int(self.log_period / 100 * num_image))
         try:
-            with self.dataset_cls(str(save_dir)) as db:
+            with self.dataset_cls(str(save_dir), **self.dataset_kwargs) as db:
                 exist_count = db.read_count()
                 count = 0
                 logger.info(f"Exist image count in {save_dir}: {exist_count}")
                 start = time.time()
+                pending = ReorderBuffer(exist_count)
                 while True:
-                    m = self.data_queue.get()
-                    if m == STOP_TOKEN:
+                    samples = self.transport.get()
+                    if samples is None:
                         logger.info("DBWriterProcess receive stop token")
                         break
 
-                    name = "{:09d}".format(exist_count + count)
-                    db.write(name, m["image"], m["label"])
-                    count += 1
-                    if count % log_period == 0:
-                        logger.info(
-                            f"{(count/num_image)*100:.2f}%({count}/{num_image}) {log_period/(time.time() - start + 1e-8):.1f} img/s"
-                        )
-                        start = time.time()
+                    pending.push(samples)
+                    for m in pending.pop_ready():
+                        name = "{:09d}".format(m["index"])
+                        db.write_encoded(name, m["image"], m["label"], m["size"])
+                        count += 1
+                        if count % log_period == 0:
+                            logger.info(
+                                f"{(count/num_image)*100:.2f}%({count}/{num_image}) {log_period/(time.time() - start + 1e-8):.1f} img/s"
+                            )
+                            start = time.time()
+
+                if pending:
+                    logger.warning(
+                        f"Drop {len(pending)} samples after missing index {exist_count + count}"
+                    )
                 db.write_count(count + exist_count)
-                logger.info(f"{(count / num_image) * 100:.2f}%({count}/{num_image})")
+                if num_image > 0:
+                    logger.info(
+                        f"{(count / num_image) * 100:.2f}%({count}/{num_image})"
+                    )
                 logger.info(f"Finish generate: {count}. Total: {exist_count+count}")
         except Exception as e:
             logger.exception("DBWriterProcess error")
             raise e
 
 
-def generate_img(data_queue):
-    data = render()
-    if data is not None:
-        data_queue.put({"image": data[0], "label": data[1]})
+def generate_imgs(task):
+    """
+    Render a chunk of images and send them to DBWriterProcess of the generator's shard as one message.
+    Images are encoded here, DBWriterProcess only writes the encoded bytes
+
+    Args:
+        task: (generator_idx, shard, sample_start, index_start, count). sample_start is the index of first sample
+            in generator, used to seed each sample. index_start is the index of first sample in shard dataset
+
+    Returns:
+        generator_idx of the task
+    """
+    generator_idx, shard, sample_start, index_start, count = task
+    render = renders.get(generator_idx)
+    if render is None:
+        render = Render(render_cfgs[generator_idx])
+        renders[generator_idx] = render
+
+    def before_sample(i):
+        if seed is not None:
+            seed_sample(seed, generator_idx, sample_start + i)
+
+    batch = render.render_batch(count, before_sample)
+    samples = []
+    for i, (image, label) in enumerate(zip(batch.images, batch.labels)):
+        height, width = image.shape[:2]
+        samples.append(
+            {
+                "image": dataset_cls.encode(image, jpg_quality),
+                "label": label,
+                "size": (width, height),
+                "index": index_start + i,
+            }
+        )
+
+    if samples:
+        transports[generator_idx][shard].put(samples)
+    return generator_idx
+
+
+def read_exist_count(dataset_cls, save_dir: Path) -> int:
+    with dataset_cls(str(save_dir)) as db:
+        return db.read_count()
 
 
 def process_setup(*args):
-    global render
+    global render_cfgs, transports, dataset_cls, seed, jpg_quality
     import numpy as np
 
-    # Make sure different process has different random seed
+    # Make sure different process has different random seed,
+    # if seed is set, each sample will be seeded in generate_imgs
     np.random.seed()
+    random.seed()
 
-    render = Render(args[0])
+    render_cfgs = args[0]
+    transports = args[1]
+    dataset_cls = args[2]
+    seed = args[3]
+    jpg_quality = args[4].get("jpg_quality", jpg_quality)
     logger.info(f"Finish setup image generate process: {os.getpid()}")
 
 
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--config", required=True, help="python file path")
-    parser.add_argument("--dataset", default="img", choices=["lmdb", "img"])
+    parser.add_argument(
+        "--dataset", default="img", choices=["lmdb", "img", "tar", "memmap"]
+    )
+    parser.add_argument(
+        "--commit_interval",
+        type=int,
+        default=1000,
+        help="lmdb dataset: commit every N images. -1 only commits at the end",
+    )
+    parser.add_argument(
+        "--commit_period",
+        type=float,
+        default=None,
+        help="lmdb dataset: also commit if last commit is N seconds ago",
+    )
+    parser.add_argument(
+        "--tar_shard_size",
+        type=float,
+        default=1024,
+        help="tar dataset: max size(MB) of one tar file",
+    )
+    parser.add_argument(
+        "--jpg_quality",
+        type=int,
+        default=95,
+        help="JPEG quality of img/lmdb/tar dataset",
+    )
     parser.add_argument("--num_processes", type=int, default=4)
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=32,
+        help="Number of images rendered by one task of a render process",
+    )
     parser.add_argument("--log_period", type=float, default=10)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="If set, each sample is seeded by (seed, generator index, sample index), "
+        "output does not depend on num_processes",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Treat num_image as total number of images, continue from exist images in save_dir",
+    )
+    parser.add_argument(
+        "--transport",
+        default="queue",
+        choices=["queue", "shm"],
+        help="queue: multiprocessing Manager queue. shm: shared memory ring buffer(python>=3.8)",
+    )
+    parser.add_argument(
+        "--shm_slots", type=int, default=256, help="Number of slots in ring buffer"
+    )
+    parser.add_argument(
+        "--shm_slot_size",
+        type=int,
+        default=256 * 1024,
+        help="Bytes of one slot, larger image will be sent through pipe",
+    )
+    parser.add_argument(
+        "--num_shards",
+        type=int,
+        default=1,
+        help="If > 1, images are written by num_shards DBWriterProcess into save_dir/shard-xxxxx",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     mp.set_start_method("spawn", force=True)
-    manager = mp.Manager()
-    data_queue = manager.Queue()
     args = parse_args()
 
-    dataset_cls = LmdbDataset if args.dataset == "lmdb" else ImgDataset
-
     generator_cfgs = get_cfg(args.config)
 
-    for generator_cfg in generator_cfgs:
-        db_writer_process = DBWriterProcess(
-            dataset_cls, data_queue, generator_cfg, args.log_period
+    dataset_cls = {
+        "lmdb": LmdbDataset,
+        "img": ImgDataset,
+        "tar": TarDataset,
+        "memmap": MemmapDataset,
+    }[args.dataset]
+    dataset_kwargs = {}
+    if args.dataset != "memmap":
+        dataset_kwargs["jpg_quality"] = args.jpg_quality
+    if args.dataset == "lmdb":
+        dataset_kwargs.update(
+            commit_interval=args.commit_interval, commit_period=args.commit_period
+        )
+    elif args.dataset == "tar":
+        dataset_kwargs.update(max_shard_size=int(args.tar_shard_size * 1024 * 1024))
+
+    # one transport for each shard of each generator
+    if args.transport == "shm":
+        # generators share one ring buffer per shard, only metadata pipes are per generator
+        rings = [
+            ShmRingTransport(args.shm_slots, args.shm_slot_size)
+            for _ in range(args.num_shards)
+        ]
+        transports = [
+            [ring if i == 0 else ShmRingTransport(ring=ring) for ring in rings]
+            for i in range(len(generator_cfgs))
+        ]
+    else:
+        manager = mp.Manager()
+        transports = [
+            [QueueTransport(manager) for _ in range(args.num_shards)]
+            for _ in generator_cfgs
+        ]
+
+    generator_tasks = []
+    generator_num_tasks = []
+    generator_writers = []
+    for generator_idx, generator_cfg in enumerate(generator_cfgs):
+        if args.num_shards == 1:
+            shard_dirs = [generator_cfg.save_dir]
+        else:
+            shard_dirs = [
+                Path(generator_cfg.save_dir) / ShardedDataset.shard_name(i)
+                for i in range(args.num_shards)
+            ]
+
+        exist_counts = [read_exist_count(dataset_cls, it) for it in shard_dirs]
+        shard_num_images, num_tasks = count_tasks(
+            generator_cfg.num_image, args.chunk_size, exist_counts, args.resume
+        )
+
+        db_writer_processes = []
+        for shard, shard_dir in enumerate(shard_dirs):
+            db_writer_process = DBWriterProcess(
+                dataset_cls,
+                transports[generator_idx][shard],
+                shard_dir,
+                shard_num_images[shard],
+                args.log_period,
+                dataset_kwargs,
+            )
+            db_writer_process.start()
+            db_writer_processes.append(db_writer_process)
+
+        generator_tasks.append(
+            iter_tasks(
+                generator_cfg.num_image, args.chunk_size, exist_counts, args.resume
+            )
+        )
+        generator_num_tasks.append(num_tasks)
+        generator_writers.append(db_writer_processes)
+
+    finished = [False] * len(generator_cfgs)
+
+    def stop_writers(generator_idx: int):
+        for transport in transports[generator_idx]:
+            transport.put_stop()
+        for db_writer_process in generator_writers[generator_idx]:
+            db_writer_process.join(WRITER_JOIN_TIMEOUT)
+            if db_writer_process.is_alive():
+                logger.error(
+                    f"DBWriterProcess {db_writer_process.pid} not stopped, terminate it"
+                )
+                db_writer_process.terminate()
+                db_writer_process.join()
+        finished[generator_idx] = True
+
+    def finish_generator(generator_idx: int):
+        stop_writers(generator_idx)
+
+        if args.num_shards > 1:
+            ShardedDataset.write_manifest(
+                str(generator_cfgs[generator_idx].save_dir),
+                dataset_cls,
+                args.num_shards,
+            )
+
+    def check_writers():
+        """
+        Raise PanicError if a writer of unfinished generator exited,
+        otherwise render processes may wait for slots of its ring buffer forever
+        """
+        for generator_idx, db_writer_processes in enumerate(generator_writers):
+            if finished[generator_idx]:
+                continue
+            for db_writer_process in db_writer_processes:
+                if not db_writer_process.is_alive():
+                    raise PanicError(
+                        f"DBWriterProcess {db_writer_process.pid} of generator {generator_idx} "
+                        f"exited with code {db_writer_process.exitcode}"
+                    )
+
+    num_remain_tasks = list(generator_num_tasks)
+
+    def on_task_done(generator_idx: int):
+        num_remain_tasks[generator_idx] -= 1
+        if num_remain_tasks[generator_idx] == 0:
+            finish_generator(generator_idx)
+
+    try:
+        # writers of a generator are stopped as soon as all tasks of the generator finished
+        for generator_idx, num_tasks in enumerate(num_remain_tasks):
+            if num_tasks == 0:
+                finish_generator(generator_idx)
+
+        tasks = interleave_tasks(generator_tasks)
+        setup_args = (
+            [it.render_cfg for it in generator_cfgs],
+            transports,
+            dataset_cls,
+            args.seed,
+            dataset_kwargs,
         )
-        db_writer_process.start()
 
         if args.num_processes == 0:
-            process_setup(generator_cfg.render_cfg)
-            for _ in range(generator_cfg.num_image):
-                generate_img(data_queue)
-            data_queue.put(STOP_TOKEN)
-            db_writer_process.join()
+            process_setup(*setup_args)
+            for task in tasks:
+                check_writers()
+                on_task_done(generate_imgs(task))
         else:
+            # One pool for all generators, each process creates Render of a generator on its first task
             with mp.Pool(
                 processes=args.num_processes,
                 initializer=process_setup,
-                initargs=(generator_cfg.render_cfg,),
+                initargs=setup_args,
             ) as pool:
-                for _ in range(generator_cfg.num_image):
-                    pool.apply_async(generate_img, args=(data_queue,))
+                results = pool.imap_unordered(generate_imgs, tasks)
+                while True:
+                    try:
+                        generator_idx = results.next(WRITER_CHECK_PERIOD)
+                    except StopIteration:
+                        break
+                    except mp.TimeoutError:
+                        generator_idx = None
+
+                    try:
+                        check_writers()
+                    except PanicError:
+                        pool.terminate()
+                        raise
+                    if generator_idx is not None:
+                        on_task_done(generator_idx)
 
                 pool.close()
                 pool.join()
+    finally:
+        # A failed task is re-raised by the pool, writers of unfinished generators would wait for
+        # stop token forever. Stop them so images already rendered are saved and the process can exit
+        for generator_idx in range(len(generator_cfgs)):
+            if not finished[generator_idx]:
+                stop_writers(generator_idx)
+
+        # always release shared memory, shared rings are released by their owner
+        for it in transports:
+            for transport in it:
+                transport.close()
 
-            data_queue.put(STOP_TOKEN)
-            db_writer_process.join()
+    failed = [it for writers in generator_writers for it in writers if it.exitcode != 0]
+    for it in failed:
+        logger.error(f"DBWriterProcess {it.pid} exited with code {it.exitcode}")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,7 @@
+def __getattr__(name):
+    # streaming imports Render, import it lazily to keep `import text_renderer.xxx` light
+    if name in ("stream", "RenderStream"):
+        from text_renderer import streaming
+
+        return getattr(streaming, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,10 +7,24 @@ from PIL import Image
 from PIL.Image import Image as PILImage
 from loguru import logger
 
+from text_renderer.utils.lru_cache import LRUCache
 from text_renderer.utils.utils import random_choice
 
 IMAGE_EXTENSIONS = {".jpeg", ".jpg", ".JPG", ".JPEG", ".PNG", ".png", ".bmp", ".BMP"}
 
+# id(bg image) -> (bg image, mean), keeps a reference so the id is not reused while cached
+_bg_means = LRUCache(maxsize=64)
+
+
+def get_bg_mean(bg_img: PILImage) -> float:
+    """
+    Mean value of all channels of a background image, memoized for images returned by
+    :meth:`BgManager.get_bg` which are reused by many samples. Image must not be changed after it.
+    """
+    return _bg_means.get_or_create(
+        id(bg_img), lambda: (bg_img, float(np.mean(np.array(bg_img))))
+    )[1]
+
 
 class BgManager:
     def __init__(self, bg_dir: Path, pre_load: bool = True):
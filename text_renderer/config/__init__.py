@@ -9,6 +9,7 @@ from typing import List, Tuple, Union
 import numpy as np
 from PIL.Image import Image as PILImage
 
+from text_renderer.bg_manager import get_bg_mean
 from text_renderer.effect import Effects
 from text_renderer.layout import Layout
 from text_renderer.layout.same_line import SameLineLayout
@@ -108,8 +109,7 @@ class SimpleTextColorCfg(TextColorCfg):
     alpha: Tuple[int, int] = (110, 255)
 
     def get_color(self, bg_img: PILImage) -> Tuple[int, int, int, int]:
-        np_img = np.array(bg_img)
-        mean = np.mean(np_img)
+        mean = get_bg_mean(bg_img)
 
         alpha = np.random.randint(*self.alpha)
         r = np.random.randint(0, int(mean * 0.7))
@@ -144,6 +144,10 @@ class RenderCfg:
         Effects apply on merged text mask image output by Layout.
     render_effects : Effects
         Effects apply on final image.
+    batch_render_effects : bool
+        Apply render_effects on all images of a chunk at once, :class:`~text_renderer.effect.ImgAugEffect`
+        augments images of the same size in one call. Random values of render_effects then depend
+        on the other images in the chunk, use the same chunk size to reproduce images.
     height : int
         Resize(keep ratio) image to height, set -1 disables resize
     gray : bool
@@ -162,6 +166,7 @@ class RenderCfg:
     perspective_transform: PerspectiveTransformCfg = None
     layout_effects: Effects = None
     render_effects: Effects = None
+    batch_render_effects: bool = False
     height: int = 32
     gray: bool = True
     text_color_cfg: TextColorCfg = None
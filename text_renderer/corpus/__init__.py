@@ -1,4 +1,4 @@
-from .corpus import Corpus, CorpusCfg
+from .corpus import Corpus, CorpusCfg, LazyCorpus
 from .char_corpus import CharCorpus, CharCorpusCfg
 from .enum_corpus import EnumCorpus, EnumCorpusCfg
 from .word_corpus import WordCorpus, WordCorpusCfg
@@ -8,6 +8,7 @@ from .rand_corpus import RandCorpus, RandCorpusCfg
 __all__ = [
     "Corpus",
     "CorpusCfg",
+    "LazyCorpus",
     "CharCorpus",
     "CharCorpusCfg",
     "EnumCorpus",
@@ -5,8 +5,9 @@ from pathlib import Path
 from typing import Tuple, Union
 
 from loguru import logger
-from tenacity import retry, stop_after_attempt
+from tenacity import retry, retry_if_exception_type, stop_after_attempt
 
+from text_renderer.font_cache import DEFAULT_FONT_CACHE_DIR
 from text_renderer.font_manager import FontManager
 from text_renderer.config import TextColorCfg, SimpleTextColorCfg
 from text_renderer.utils.errors import RetryError, PanicError
@@ -38,6 +39,12 @@ class CorpusCfg:
         horizontal : bool
             generate the horizontal(default) or vertical text
             Set False to generate vertical text
+        font_cache_dir : path
+            directory of persistent font capability cache, see :class:`~text_renderer.font_cache.FontCache`.
+            Default is ``~/.cache/text_renderer/fonts`` or ``$TEXT_RENDERER_CACHE_DIR/fonts``. Set None to disable
+        use_glyph_cache : bool
+            When text is drawn char by char(char_spacing is set or vertical text), paste cached char masks.
+            Set False for fonts need shaping or color fonts
     """
     font_dir: Path
     font_size: Tuple[int, int]
@@ -46,6 +53,8 @@ class CorpusCfg:
     char_spacing: Union[float, Tuple[float, float]] = -1
     text_color_cfg: TextColorCfg = SimpleTextColorCfg()
     horizontal: bool = True
+    font_cache_dir: Path = DEFAULT_FONT_CACHE_DIR
+    use_glyph_cache: bool = True
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -55,6 +64,17 @@ class CorpusCfg:
             cls.__doc__ += CorpusCfg.__doc__
 
 
+# Corpus.sample raises PanicError if no font supports the sampled text for this many times in a row
+MAX_SAMPLE_ATTEMPTS = 100
+
+
+def _raise_no_font_support(retry_state):
+    raise PanicError(
+        f"No font supports the sampled text in {retry_state.attempt_number} attempts, "
+        f"check font_dir and chars of the corpus. Last error: {retry_state.outcome.exception()}"
+    )
+
+
 class Corpus:
     """
     Base class of different corpus. See :class:`~text_renderer.corpus.CorpusCfg` for base configs for corpus.
@@ -65,17 +85,35 @@ class Corpus:
     ):
         self.cfg = cfg
         self.font_manager = FontManager(
-            cfg.font_dir, cfg.font_list_file, cfg.font_size,
+            cfg.font_dir, cfg.font_list_file, cfg.font_size, cfg.font_cache_dir,
         )
 
-    @retry
+    @classmethod
+    def lazy(cls, cfg: "CorpusCfg") -> "LazyCorpus":
+        """
+        Create corpus on first use instead of when the config file is loaded, see :class:`LazyCorpus`
+
+        .. code-block:: python
+
+            corpus = WordCorpus.lazy(WordCorpusCfg(...))
+        """
+        return LazyCorpus(cls, cfg)
+
+    @retry(
+        stop=stop_after_attempt(MAX_SAMPLE_ATTEMPTS),
+        retry=retry_if_exception_type(RetryError),
+        retry_error_callback=_raise_no_font_support,
+    )
     def sample(self):
         """
         This method ensures that the selected font supports all characters.
+        Font is picked from fonts support all chars of the text, text is sampled again if no font supports it.
 
         Returns:
             FontText: A FontText object contains text and font.
 
+        Raises:
+            PanicError: No font supports text after MAX_SAMPLE_ATTEMPTS samples
         """
         try:
             text = self.get_text()
@@ -86,14 +124,11 @@ class Corpus:
         if self.cfg.clip_length != -1 and len(text) > self.cfg.clip_length:
             text = text[: self.cfg.clip_length]
 
-        font, support_chars, font_path = self.font_manager.get_font()
-        status, intersect = self.font_manager.check_support(text, support_chars)
-        if not status:
-            err_msg = (
-                f"{self.__class__.__name__} {font_path} not support chars: {intersect}"
-            )
-            logger.debug(err_msg)
-            raise RetryError(err_msg)
+        try:
+            font, support_chars, font_path = self.font_manager.get_font(text)
+        except RetryError as e:
+            logger.debug(f"{self.__class__.__name__} {e}")
+            raise e
 
         return FontText(font, text, font_path, self.cfg.horizontal)
 
@@ -156,3 +191,42 @@ class Corpus:
             f"Unique chars({len(set(filtered_chars))}): {set(filtered_chars)}"
         )
         return out
+
+
+class LazyCorpus:
+    """
+    Lightweight spec of a corpus: only corpus class and config are stored and pickled.
+    Text and fonts are loaded when the corpus is first used, so each render process
+    loads them itself instead of receiving a pickled copy from the main process.
+
+    Attributes of the real corpus can be accessed directly, ``cfg`` is available without loading.
+    """
+
+    def __init__(self, corpus_cls: type, cfg: "CorpusCfg"):
+        self.corpus_cls = corpus_cls
+        self.cfg = cfg
+        self._corpus = None
+
+    @property
+    def corpus(self) -> Corpus:
+        if self._corpus is None:
+            self._corpus = self.corpus_cls(self.cfg)
+        return self._corpus
+
+    def sample(self):
+        return self.corpus.sample()
+
+    def __getattr__(self, item):
+        # only called when item is not found in LazyCorpus
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return getattr(self.corpus, item)
+
+    def __getstate__(self):
+        # never pickle loaded corpus
+        return {"corpus_cls": self.corpus_cls, "cfg": self.cfg}
+
+    def __setstate__(self, state):
+        self.corpus_cls = state["corpus_cls"]
+        self.cfg = state["cfg"]
+        self._corpus = None
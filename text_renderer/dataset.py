@@ -1,23 +1,79 @@
+import io
 import os
 import json
-from typing import Dict
+import struct
+import tarfile
+import time
+from typing import Dict, List, Optional, Tuple
 
 import lmdb
 import cv2
 import numpy as np
 
+from text_renderer.utils.errors import PanicError
+
 
 class Dataset:
-    def __init__(self, data_dir: str, jpg_quality: int = 95):
+    def __init__(self, data_dir: str, jpg_quality: int = 95, readonly: bool = False):
+        """
+
+        Parameters
+        ----------
+            data_dir : str
+            jpg_quality : int
+            readonly : bool
+                Open for reading only, nothing in data_dir is created or changed,
+                so it can be opened while another process is writing it
+        """
         self.data_dir = data_dir
-        if not os.path.exists(data_dir):
+        self.readonly = readonly
+        if not readonly and not os.path.exists(data_dir):
             os.makedirs(data_dir)
         self.jpg_quality = jpg_quality
 
     def encode_param(self):
         return [int(cv2.IMWRITE_JPEG_QUALITY), self.jpg_quality]
 
+    @classmethod
+    def encode(cls, image: np.ndarray, jpg_quality: int = 95) -> np.ndarray:
+        """
+        Encode image before write, called in render process so encoding scales with render processes.
+
+        Parameters
+        ----------
+            image : ndarray
+            jpg_quality : int
+
+        Returns
+        -------
+            ndarray: uint8 buffer passed to :meth:`write_encoded`
+        """
+        _, image_buf = cv2.imencode(
+            ".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), jpg_quality]
+        )
+        return image_buf.reshape(-1)
+
     def write(self, name: str, image: np.ndarray, label: str):
+        height, width = image.shape[:2]
+        self.write_encoded(
+            name, self.encode(image, self.jpg_quality), label, (width, height)
+        )
+
+    def write_encoded(
+        self, name: str, image_buf: np.ndarray, label: str, size: Tuple[int, int]
+    ):
+        """
+
+        Parameters
+        ----------
+            name : str
+                000000001
+            image_buf : ndarray
+                output of :meth:`encode`
+            label : str
+            size : Tuple[int, int]
+                (width, height) of image before encoding
+        """
         pass
 
     def read(self, name) -> Dict:
@@ -60,8 +116,21 @@ class Dataset:
 
 class ImgDataset(Dataset):
     """
-    Save generated image as jpg file, save label and meta in json
-    json file format:
+    Save generated image as jpg file, labels and sizes are appended to a jsonl journal
+    one line per image:
+
+    .. code-block:: bash
+
+        {"name": "000000000", "label": "test", "size": [width, height]}
+        {"name": "000000001", "label": "text2", "size": [width, height]}
+
+    ``labels.idx`` stores the end offset(uint64) of each line in ``labels.jsonl``,
+    so num-samples is the size of index file / 8 and a label can be read without parsing the whole journal.
+    Lines not recorded in the index (e.g. process killed while writing) are dropped on next open for writing,
+    readers ignore them.
+
+    A legacy ``labels.json`` in data_dir is imported into the journal on first open,
+    use :meth:`export_labels_json` to convert the journal back to ``labels.json`` format:
 
     .. code-block:: bash
 
@@ -79,46 +148,174 @@ class ImgDataset(Dataset):
     """
 
     LABEL_NAME = "labels.json"
+    JOURNAL_NAME = "labels.jsonl"
+    INDEX_NAME = "labels.idx"
+    _OFFSET = struct.Struct("<Q")
 
-    def __init__(self, data_dir: str):
-        super().__init__(data_dir)
+    def __init__(self, data_dir: str, jpg_quality: int = 95, readonly: bool = False):
+        super().__init__(data_dir, jpg_quality, readonly)
         self._img_dir = os.path.join(data_dir, "images")
-        if not os.path.exists(self._img_dir):
+        if not readonly and not os.path.exists(self._img_dir):
             os.makedirs(self._img_dir)
         self._label_path = os.path.join(data_dir, self.LABEL_NAME)
+        self._journal_path = os.path.join(data_dir, self.JOURNAL_NAME)
+        self._index_path = os.path.join(data_dir, self.INDEX_NAME)
 
-        self._data = {"num-samples": 0, "labels": {}, "sizes": {}}
-        if os.path.exists(self._label_path):
+        legacy_data = None
+        if not os.path.exists(self._journal_path) and os.path.exists(self._label_path):
             with open(self._label_path, "r", encoding="utf-8") as f:
-                self._data = json.load(f)
-
-    def write(self, name: str, image: np.ndarray, label: str):
+                legacy_data = json.load(f)
+
+        self._num_samples, journal_size = self._recover()
+        self._journal_size = journal_size
+        self._journal = None
+        self._index = None
+        if readonly:
+            if legacy_data is not None:
+                raise PanicError(
+                    f"Open {data_dir} for writing once to import {self.LABEL_NAME}"
+                )
+            return
+
+        self._journal = open(self._journal_path, "ab")
+        self._index = open(self._index_path, "ab")
+
+        if legacy_data is not None:
+            for name in sorted(legacy_data["labels"].keys()):
+                self._append(
+                    name, legacy_data["labels"][name], legacy_data["sizes"][name]
+                )
+            self._flush()
+
+    def write_encoded(
+        self, name: str, image_buf: np.ndarray, label: str, size: Tuple[int, int]
+    ):
+        if self.readonly:
+            raise PanicError(f"{self.data_dir} is opened readonly")
         img_path = os.path.join(self._img_dir, name + ".jpg")
-        cv2.imwrite(img_path, image, self.encode_param())
-        self._data["labels"][name] = label
-
-        height, width = image.shape[:2]
-        self._data["sizes"][name] = (width, height)
+        with open(img_path, "wb") as f:
+            f.write(image_buf.tobytes())
+        self._append(name, label, size)
 
     def read(self, name: str) -> Dict:
         img_path = os.path.join(self._img_dir, name + ".jpg")
         image = cv2.imread(img_path)
-        label = self._data["labels"][name]
-        size = self._data["sizes"][name]
-        return {"image": image, "label": label, "size": size}
+        record = self._read_record(name)
+        return {"image": image, "label": record["label"], "size": record["size"]}
 
     def read_size(self, name: str) -> [int, int]:
-        return self._data["sizes"][name]
+        return self._read_record(name)["size"]
 
     def read_count(self) -> int:
-        return self._data.get("num-samples", 0)
+        return self._num_samples
 
     def write_count(self, count: int):
-        self._data["num-samples"] = count
+        # num-samples is the number of lines in labels.idx, make sure they are on disk
+        self._flush()
 
     def close(self):
-        with open(self._label_path, "w", encoding="utf-8") as f:
-            json.dump(self._data, f, indent=2, ensure_ascii=False)
+        if self._journal is not None:
+            self._journal.close()
+            self._index.close()
+
+    def export_labels_json(self, output_path: str = None):
+        """
+        Convert the journal to legacy ``labels.json`` format
+
+        Parameters
+        ----------
+            output_path : str
+                Default is labels.json in data_dir
+        """
+        self._flush()
+        data = {"num-samples": self._num_samples, "labels": {}, "sizes": {}}
+        for record in self._iter_records():
+            data["labels"][record["name"]] = record["label"]
+            data["sizes"][record["name"]] = record["size"]
+
+        if output_path is None:
+            output_path = self._label_path
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def _append(self, name: str, label: str, size: Tuple[int, int]):
+        line = json.dumps(
+            {"name": name, "label": label, "size": list(size)}, ensure_ascii=False
+        )
+        line = (line + "\n").encode("utf-8")
+        self._journal.write(line)
+        self._journal_size += len(line)
+        self._index.write(self._OFFSET.pack(self._journal_size))
+        self._num_samples += 1
+
+    def _flush(self):
+        if self._journal is not None:
+            self._journal.flush()
+            self._index.flush()
+
+    def _recover(self) -> Tuple[int, int]:
+        """
+        Drop index entries pointing beyond journal and journal lines not in index.
+        Readonly dataset only ignores them, a writer may be appending to the files
+
+        Returns:
+            (num-samples, journal size)
+        """
+        journal_size = 0
+        if os.path.exists(self._journal_path):
+            journal_size = os.path.getsize(self._journal_path)
+
+        num_samples = 0
+        end = 0
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "rb") as f:
+                buf = f.read()
+            # last entry may be partially written
+            size = len(buf) // self._OFFSET.size * self._OFFSET.size
+            offsets = np.frombuffer(buf[:size], dtype="<u8")
+            num_samples = int(np.searchsorted(offsets, journal_size, side="right"))
+            if num_samples > 0:
+                end = int(offsets[num_samples - 1])
+
+        if not self.readonly:
+            with open(self._index_path, "ab") as f:
+                f.truncate(num_samples * self._OFFSET.size)
+            with open(self._journal_path, "ab") as f:
+                f.truncate(end)
+
+        return num_samples, end
+
+    def _read_record(self, name: str) -> Dict:
+        self._flush()
+        # name is the zero-padded index of image, fallback to scan journal if not
+        if name.isdigit() and int(name) < self._num_samples:
+            idx = int(name)
+            with open(self._index_path, "rb") as f:
+                f.seek(max(idx - 1, 0) * self._OFFSET.size)
+                offsets = np.frombuffer(f.read(self._OFFSET.size * 2), dtype="<u8")
+            start, end = (0, offsets[0]) if idx == 0 else offsets[:2]
+            with open(self._journal_path, "rb") as f:
+                f.seek(int(start))
+                record = json.loads(f.read(int(end - start)).decode("utf-8"))
+            if record["name"] == name:
+                return record
+
+        for record in self._iter_records():
+            if record["name"] == name:
+                return record
+        raise KeyError(name)
+
+    def _iter_records(self):
+        if not os.path.exists(self._journal_path):
+            return
+        # lines after journal size are not indexed yet
+        pos = 0
+        with open(self._journal_path, "rb") as f:
+            for line in f:
+                pos += len(line)
+                if pos > self._journal_size:
+                    break
+                yield json.loads(line.decode("utf-8"))
 
 
 class LmdbDataset(Dataset):
@@ -129,24 +326,84 @@ class LmdbDataset(Dataset):
         - image-000000001: image raw bytes
         - label-000000001: string
         - size-000000001: "width,height"
+        - num-samples: updated on every commit
 
+    Write transaction is committed every ``commit_interval`` writes or every ``commit_period`` seconds,
+    so memory of dirty pages is bounded, a crashed run keeps committed samples,
+    and the db can be opened by readonly readers while generating.
     """
 
-    def __init__(self, data_dir: str):
-        super().__init__(data_dir)
-        self._lmdb_env = lmdb.open(self.data_dir, map_size=1099511627776)  # 1T
-        self._lmdb_txn = self._lmdb_env.begin(write=True)
+    def __init__(
+        self,
+        data_dir: str,
+        commit_interval: int = 1000,
+        commit_period: Optional[float] = None,
+        jpg_quality: int = 95,
+        readonly: bool = False,
+    ):
+        """
 
-    def write(self, name: str, image: np.ndarray, label: str):
-        self._lmdb_txn.put(
-            self.image_key(name),
-            cv2.imencode(".jpg", image, self.encode_param())[1].tobytes(),
-        )
+        Parameters
+        ----------
+            data_dir : str
+            commit_interval : int
+                Commit write transaction every commit_interval writes. Set -1 to only commit on close
+            commit_period : float
+                If not None, also commit write transaction if last commit is commit_period seconds ago
+            jpg_quality : int
+            readonly : bool
+                Use a read transaction, samples committed after open are not visible
+        """
+        super().__init__(data_dir, jpg_quality, readonly)
+        self.commit_interval = commit_interval
+        self.commit_period = commit_period
+        if readonly:
+            self._lmdb_env = lmdb.open(self.data_dir, readonly=True, lock=False)
+        else:
+            self._lmdb_env = lmdb.open(self.data_dir, map_size=1099511627776)  # 1T
+        self._lmdb_txn = self._lmdb_env.begin(write=not readonly)
+        self._num_samples = self.read_count()
+        self._num_uncommitted = 0
+        self._last_commit_time = time.time()
+
+    def write_encoded(
+        self, name: str, image_buf: np.ndarray, label: str, size: Tuple[int, int]
+    ):
+        if self.readonly:
+            raise PanicError(f"{self.data_dir} is opened readonly")
+        self._lmdb_txn.put(self.image_key(name), image_buf.tobytes())
         self._lmdb_txn.put(self.label_key(name), label.encode())
 
-        height, width = image.shape[:2]
+        width, height = size
         self._lmdb_txn.put(self.size_key(name), f"{width},{height}".encode())
 
+        self._num_samples += 1
+        self._num_uncommitted += 1
+        if self._should_commit():
+            self.commit()
+
+    def commit(self):
+        """
+        Commit current write transaction with num-samples, then begin a new one
+        """
+        self.write_count(self._num_samples)
+        self._lmdb_txn.commit()
+        self._lmdb_txn = self._lmdb_env.begin(write=True)
+        self._num_uncommitted = 0
+        self._last_commit_time = time.time()
+
+    def _should_commit(self) -> bool:
+        if self.commit_interval != -1 and self._num_uncommitted >= self.commit_interval:
+            return True
+
+        if (
+            self.commit_period is not None
+            and time.time() - self._last_commit_time >= self.commit_period
+        ):
+            return True
+
+        return False
+
     def read(self, name: str) -> Dict:
         label = self._lmdb_txn.get(self.label_key(name)).decode()
         size_str = self._lmdb_txn.get(self.size_key(name)).decode()
@@ -182,6 +439,7 @@ class LmdbDataset(Dataset):
         return int(count)
 
     def write_count(self, count: int):
+        self._num_samples = count
         self._lmdb_txn.put("num-samples".encode(), str(count).encode())
 
     def image_key(self, name: str):
@@ -197,10 +455,451 @@ class LmdbDataset(Dataset):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        if self.readonly:
+            self._lmdb_txn.abort()
+            self._lmdb_env.close()
+            return
+        if exc_type is None:
+            self.write_count(self._num_samples)
         self._lmdb_txn.__exit__(exc_type, exc_value, traceback)
         self._lmdb_env.close()
 
 
+class TarDataset(Dataset):
+    """
+    Stream samples into size-capped tar files(WebDataset format), good for sequential reading.
+    Each sample has files with the same key in tar:
+
+        - 000000001.jpg: image bytes
+        - 000000001.txt: label
+        - 000000001.json: {"size": [width, height]}, only if write_meta is True
+
+    Tar files are named data-000000.tar, data-000001.tar ..., a new tar file is started when current one
+    exceeds max_shard_size. Count and tar files are saved in meta.json
+    """
+
+    META_NAME = "meta.json"
+
+    def __init__(
+        self,
+        data_dir: str,
+        max_shard_size: int = 1024**3,
+        write_meta: bool = True,
+        jpg_quality: int = 95,
+        readonly: bool = False,
+    ):
+        """
+
+        Parameters
+        ----------
+            data_dir : str
+            max_shard_size : int
+                Bytes of one tar file
+            write_meta : bool
+                Write size of image to a .json file
+            jpg_quality : int
+            readonly : bool
+                meta.json is not rewritten on close
+        """
+        super().__init__(data_dir, jpg_quality, readonly)
+        self.max_shard_size = max_shard_size
+        self.write_meta = write_meta
+        self._meta_path = os.path.join(data_dir, self.META_NAME)
+
+        self._meta = {"num-samples": 0, "shards": []}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._meta = json.load(f)
+
+        self._tar: Optional[tarfile.TarFile] = None
+        self._index: Optional[Dict[str, str]] = None
+
+    def write_encoded(
+        self, name: str, image_buf: np.ndarray, label: str, size: Tuple[int, int]
+    ):
+        if self.readonly:
+            raise PanicError(f"{self.data_dir} is opened readonly")
+        if self._tar is None or self._tar.fileobj.tell() >= self.max_shard_size:
+            self._open_next_shard()
+
+        self._add_file(f"{name}.jpg", image_buf.tobytes())
+        self._add_file(f"{name}.txt", label.encode("utf-8"))
+        if self.write_meta:
+            self._add_file(f"{name}.json", json.dumps({"size": list(size)}).encode())
+        self._meta["num-samples"] += 1
+
+    def read(self, name: str) -> Dict:
+        if self._index is None:
+            self._index = {}
+            for shard in self._meta["shards"]:
+                with tarfile.open(os.path.join(self.data_dir, shard), "r") as tar:
+                    for member in tar.getmembers():
+                        self._index[member.name] = shard
+
+        files = {}
+        with tarfile.open(
+            os.path.join(self.data_dir, self._index[f"{name}.jpg"]), "r"
+        ) as tar:
+            for ext in ["jpg", "txt", "json"]:
+                if f"{name}.{ext}" in self._index:
+                    files[ext] = tar.extractfile(f"{name}.{ext}").read()
+
+        image = cv2.imdecode(
+            np.frombuffer(files["jpg"], np.uint8), cv2.IMREAD_UNCHANGED
+        )
+        if "json" in files:
+            size = json.loads(files["json"])["size"]
+        else:
+            size = [image.shape[1], image.shape[0]]
+        return {"image": image, "label": files["txt"].decode("utf-8"), "size": size}
+
+    def read_count(self) -> int:
+        return self._meta["num-samples"]
+
+    def write_count(self, count: int):
+        self._meta["num-samples"] = count
+        # samples counted in meta.json must be readable from the unfinished tar file
+        if self._tar is not None:
+            self._tar.fileobj.flush()
+        self._save_meta()
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        if not self.readonly:
+            self._save_meta()
+
+    def _open_next_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._save_meta()
+
+        shard = "data-{:06d}.tar".format(len(self._meta["shards"]))
+        self._tar = tarfile.open(os.path.join(self.data_dir, shard), "w")
+        self._meta["shards"].append(shard)
+
+    def _add_file(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def _save_meta(self):
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f, indent=2)
+
+
+class MemmapDataset(Dataset):
+    """
+    Save raw pixels of fixed height images into one file, no image encoding/decoding needed.
+    Each image is stored column by column(width, height[, channels]), so appending image is appending bytes
+    and reading image is a zero-copy view of ``np.memmap``
+
+        - pixels.bin: raw uint8 pixels of all images
+        - widths.bin: int32 width of each image, offset of image is the cumulative sum of widths
+        - labels.txt: one json string per line
+        - meta.json: {"height": 32, "channels": 1, "num-samples": 2}
+
+    num-samples is recovered from the data files on open: the number of images whose width, label line
+    and pixels are all complete. Data written after that (e.g. process killed while writing) is dropped.
+
+    A readonly dataset ignores incomplete data instead of dropping it, a writer may be appending to the files.
+
+    Only works when all images have the same height, e.g. RenderCfg.height is not -1
+    """
+
+    PIXELS_NAME = "pixels.bin"
+    WIDTHS_NAME = "widths.bin"
+    LABELS_NAME = "labels.txt"
+    META_NAME = "meta.json"
+
+    def __init__(self, data_dir: str, readonly: bool = False):
+        super().__init__(data_dir, readonly=readonly)
+        self._pixels_path = os.path.join(data_dir, self.PIXELS_NAME)
+        self._widths_path = os.path.join(data_dir, self.WIDTHS_NAME)
+        self._labels_path = os.path.join(data_dir, self.LABELS_NAME)
+        self._meta_path = os.path.join(data_dir, self.META_NAME)
+
+        self._meta = {"height": None, "channels": None, "num-samples": 0}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._meta = json.load(f)
+
+        self._widths: List[int] = []
+        # end offset of each line in labels.txt
+        self._label_ends: List[int] = []
+        self._recover()
+
+        self._pixels_file = None
+        self._widths_file = None
+        self._labels_file = None
+        if not readonly:
+            self._pixels_file = open(self._pixels_path, "ab")
+            self._widths_file = open(self._widths_path, "ab")
+            self._labels_file = open(self._labels_path, "ab")
+        self._labels_reader = None
+
+        self._offsets: Optional[np.ndarray] = None
+        self._pixels: Optional[np.memmap] = None
+
+    @classmethod
+    def encode(cls, image: np.ndarray, jpg_quality: int = 95) -> np.ndarray:
+        """
+        Returns raw pixels column by column
+        """
+        return np.ascontiguousarray(image.swapaxes(0, 1)).reshape(-1)
+
+    def write_encoded(
+        self, name: str, image_buf: np.ndarray, label: str, size: Tuple[int, int]
+    ):
+        if self.readonly:
+            raise PanicError(f"{self.data_dir} is opened readonly")
+        width, height = size
+        channels = image_buf.size // (width * height)
+        if self._meta["height"] is None:
+            self._meta["height"] = height
+            self._meta["channels"] = channels
+            # height and channels are needed to recover pixels.bin
+            self._write_meta()
+
+        if height != self._meta["height"] or channels != self._meta["channels"]:
+            raise PanicError(
+                f"MemmapDataset requires fixed image height and channels: "
+                f"{self._meta['height']}x{self._meta['channels']}, got {height}x{channels}"
+            )
+
+        line = (json.dumps(label, ensure_ascii=False) + "\n").encode("utf-8")
+        label_start = self._label_ends[-1] if self._label_ends else 0
+
+        self._pixels_file.write(image_buf.tobytes())
+        self._widths_file.write(np.int32(width).tobytes())
+        self._labels_file.write(line)
+        self._widths.append(width)
+        self._label_ends.append(label_start + len(line))
+        self._meta["num-samples"] += 1
+        self._offsets = None
+
+    def read(self, name: str) -> Dict:
+        """
+        image is a read-only view of memmap file, copy it if you need to modify it
+        """
+        idx = int(name)
+        if self._offsets is None:
+            self._flush()
+            self._offsets = np.concatenate([[0], np.cumsum(self._widths)])
+
+        height, channels = self._meta["height"], self._meta["channels"]
+        if self._pixels is None or len(self._pixels) < self._offsets[-1]:
+            self._pixels = np.memmap(
+                self._pixels_path,
+                dtype=np.uint8,
+                mode="r",
+                shape=(int(self._offsets[-1]), height, channels),
+            )
+
+        columns = self._pixels[self._offsets[idx] : self._offsets[idx + 1]]
+        image = columns.swapaxes(0, 1)
+        if channels == 1:
+            image = image[:, :, 0]
+        return {
+            "image": image,
+            "label": self._read_label(idx),
+            "size": [self._widths[idx], height],
+        }
+
+    def read_count(self) -> int:
+        return self._meta["num-samples"]
+
+    def write_count(self, count: int):
+        self._meta["num-samples"] = count
+        self._flush()
+
+    def close(self):
+        self._flush()
+        if self._pixels_file is not None:
+            self._pixels_file.close()
+            self._widths_file.close()
+            self._labels_file.close()
+        if self._labels_reader is not None:
+            self._labels_reader.close()
+            self._labels_reader = None
+        self._pixels = None
+
+    def _read_label(self, idx: int) -> str:
+        if self._labels_reader is None:
+            self._labels_reader = open(self._labels_path, "rb")
+        start = self._label_ends[idx - 1] if idx > 0 else 0
+        self._labels_reader.seek(start)
+        line = self._labels_reader.read(self._label_ends[idx] - start)
+        return json.loads(line.decode("utf-8"))
+
+    def _flush(self):
+        if self.readonly:
+            return
+        self._pixels_file.flush()
+        self._widths_file.flush()
+        self._labels_file.flush()
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f)
+
+    def _recover(self):
+        """
+        Count images complete in all data files, drop data written after them unless readonly
+        """
+        widths = np.zeros(0, dtype=np.int32)
+        if os.path.exists(self._widths_path):
+            with open(self._widths_path, "rb") as f:
+                buf = f.read()
+            widths = np.frombuffer(buf[: len(buf) // 4 * 4], dtype=np.int32)
+
+        label_ends = []
+        if os.path.exists(self._labels_path):
+            end = 0
+            with open(self._labels_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    end += len(line)
+                    label_ends.append(end)
+
+        count = min(len(widths), len(label_ends))
+        pixels_size = 0
+        if self._meta["height"] is None:
+            count = 0
+        elif count > 0:
+            column_size = self._meta["height"] * self._meta["channels"]
+            num_columns = 0
+            if os.path.exists(self._pixels_path):
+                num_columns = os.path.getsize(self._pixels_path) // column_size
+            ends = np.cumsum(widths[:count], dtype=np.int64)
+            count = int(np.searchsorted(ends, num_columns, side="right"))
+            if count > 0:
+                pixels_size = int(ends[count - 1]) * column_size
+
+        self._widths = widths[:count].tolist()
+        self._label_ends = label_ends[:count]
+        self._meta["num-samples"] = count
+
+        if self.readonly:
+            return
+
+        labels_size = self._label_ends[-1] if count > 0 else 0
+        for path, size in [
+            (self._pixels_path, pixels_size),
+            (self._widths_path, count * 4),
+            (self._labels_path, labels_size),
+        ]:
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "ab") as f:
+                    f.truncate(size)
+
+
+class ShardedDataset:
+    """
+    Read shards written by multiple DBWriterProcess as one dataset.
+    Each shard is a dataset in data_dir/shard-xxxxx with its own count and names,
+    shards and their counts are listed in data_dir/manifest.json:
+
+    .. code-block:: bash
+
+        {
+            "dataset": "LmdbDataset",
+            "num-samples": 3,
+            "shards": [
+                {"path": "shard-00000", "num-samples": 2},
+                {"path": "shard-00001", "num-samples": 1}
+            ]
+        }
+
+    Name of a sample is its global index, e.g. 000000002 is 000000000 in shard-00001.
+    Shards are opened readonly, nothing in data_dir is changed by reading.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        with open(
+            os.path.join(data_dir, self.MANIFEST_NAME), "r", encoding="utf-8"
+        ) as f:
+            self.manifest = json.load(f)
+
+        self._dataset_cls = self.dataset_classes()[self.manifest["dataset"]]
+        self._ends = np.cumsum([it["num-samples"] for it in self.manifest["shards"]])
+        self._shards: Dict[int, Dataset] = {}
+
+    def read(self, name: str) -> Dict:
+        idx = int(name)
+        shard = int(np.searchsorted(self._ends, idx, side="right"))
+        start = 0 if shard == 0 else int(self._ends[shard - 1])
+        return self._get_shard(shard).read("{:09d}".format(idx - start))
+
+    def read_count(self) -> int:
+        return self.manifest["num-samples"]
+
+    def close(self):
+        for db in self._shards.values():
+            db.__exit__(None, None, None)
+        self._shards.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_shard(self, shard: int) -> Dataset:
+        if shard not in self._shards:
+            path = os.path.join(self.data_dir, self.manifest["shards"][shard]["path"])
+            self._shards[shard] = self._dataset_cls(path, readonly=True)
+        return self._shards[shard]
+
+    @staticmethod
+    def shard_name(shard: int) -> str:
+        return f"shard-{shard:05d}"
+
+    @staticmethod
+    def dataset_classes() -> Dict:
+        return {
+            it.__name__: it
+            for it in [ImgDataset, LmdbDataset, TarDataset, MemmapDataset]
+        }
+
+    @classmethod
+    def write_manifest(cls, data_dir: str, dataset_cls, num_shards: int):
+        """
+        Read count of each shard and write manifest.json
+
+        Parameters
+        ----------
+            data_dir : str
+            dataset_cls :
+                Dataset class of shards
+            num_shards : int
+        """
+        shards = []
+        for i in range(num_shards):
+            shard_dir = os.path.join(data_dir, cls.shard_name(i))
+            with dataset_cls(shard_dir, readonly=True) as db:
+                shards.append(
+                    {"path": cls.shard_name(i), "num-samples": db.read_count()}
+                )
+
+        manifest = {
+            "dataset": dataset_cls.__name__,
+            "num-samples": sum(it["num-samples"] for it in shards),
+            "shards": shards,
+        }
+        with open(
+            os.path.join(data_dir, cls.MANIFEST_NAME), "w", encoding="utf-8"
+        ) as f:
+            json.dump(manifest, f, indent=2)
+
+
 if __name__ == "__main__":
     # image = cv2.imread("f_004.jpg")
     # label = "test"
@@ -1,13 +1,13 @@
 import random
-from abc import abstractmethod
 from typing import List, Union, Tuple
 
+import numpy as np
 from PIL import PyAccess
 
 from text_renderer.effect.selector import Selector
 from text_renderer.utils.bbox import BBox
 from text_renderer.utils.types import PILImage
-from text_renderer.utils.utils import prob
+from text_renderer.utils.utils import prob, to_pil_image
 
 
 class Effect:
@@ -15,8 +15,18 @@ class Effect:
     Apply different augmentations to image.
 
     E.g. add noise, add dropout, add padding...
+
+    An effect implements :meth:`apply` on PIL image, or implements :meth:`apply_array` on
+    (height, width, 4) RGBA uint8 array and sets ``array_native = True``.
+    :class:`Effects` passes array between array native effects, image is only converted
+    when the next effect needs the other representation.
     """
 
+    # apply_array is the native implementation, apply converts PIL image to array
+    array_native: bool = False
+    # apply_array may change the input array and return it
+    inplace: bool = False
+
     def __init__(self, p=0.5):
         """
 
@@ -30,11 +40,12 @@ class Effect:
 
     def __call__(self, img, text_bbox):
         if prob(self.p):
+            if isinstance(img, np.ndarray):
+                return self.apply_array(img, text_bbox)
             return self.apply(img, text_bbox)
         return img, text_bbox
 
-    @abstractmethod
-    def apply(self, img: PILImage, text_bbox: BBox):
+    def apply(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
         """
 
         Parameters
@@ -53,7 +64,33 @@ class Effect:
             Some effects (such as Padding) may modify the relative position of the text in the image.
 
         """
-        pass
+        if not self.array_native:
+            raise NotImplementedError
+        np_img, text_bbox = self.apply_array(np.array(img), text_bbox)
+        return to_pil_image(np_img), text_bbox
+
+    def apply_array(
+        self, np_img: np.ndarray, text_bbox: BBox
+    ) -> Tuple[np.ndarray, BBox]:
+        """
+        Same as :meth:`apply` on (height, width, 4) RGBA uint8 array.
+        If ``inplace`` is True, np_img may be changed and returned.
+
+        Effect which is not ``array_native`` converts the array to PIL image and back.
+        """
+        img, text_bbox = self.apply(to_pil_image(np_img), text_bbox)
+        return np.array(img), text_bbox
+
+    def apply_batch(
+        self, imgs: List[np.ndarray], text_bboxes: List[BBox]
+    ) -> Tuple[List[np.ndarray], List[BBox]]:
+        """
+        Apply effect on each (height, width, 4) RGBA uint8 array with probability p,
+        arrays may be changed in place. Effects with per call overhead override this
+        to process the batch at once.
+        """
+        out = [self(img, bbox) for img, bbox in zip(imgs, text_bboxes)]
+        return [it[0] for it in out], [it[1] for it in out]
 
     @staticmethod
     def rand_pick(pim, col, row):
@@ -77,17 +114,44 @@ class Effect:
             random.randint(0, pim[col, row][3]),
         )
 
+    @staticmethod
+    def rand_pick_array(pixels: np.ndarray) -> np.ndarray:
+        """
+        Vectorized :meth:`rand_pick`, randomly reset every value v in pixels to [0, v]
+
+        Parameters
+        ----------
+        pixels : np.ndarray
+            uint8 pixel values of any shape
+        """
+        # floor(u * (v + 1)) is uniform on 0..v, same as random.randint(0, v)
+        return (np.random.random(pixels.shape) * (pixels + 1.0)).astype(pixels.dtype)
+
     @staticmethod
     def fix_pick(pim, col, row, value_range: Tuple[int, int]):
         value = random.randint(*value_range)
         pim[col, row] = (value, value, value, value)
 
+    @staticmethod
+    def fix_pick_array(
+        shape: Tuple[int, ...], value_range: Tuple[int, int]
+    ) -> np.ndarray:
+        """
+        Vectorized :meth:`fix_pick`, random values in [min, max] of shape, same value for all channels of a pixel
+        """
+        return np.random.randint(
+            value_range[0], value_range[1] + 1, size=shape, dtype=np.uint8
+        )
+
 
 class NoEffects:
     """
     Placeholder when you don't want to apply effects for multi corpus
     """
 
+    array_native = True
+    inplace = False
+
     def __call__(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
         """Make NoEffects callable to be compatible with OneOf selector"""
         return img, text_bbox
@@ -95,6 +159,11 @@ class NoEffects:
     def apply_effects(self, img: PILImage, bbox: BBox) -> Tuple[PILImage, BBox]:
         return img, bbox
 
+    def apply_batch(
+        self, imgs: List[np.ndarray], bboxes: List[BBox]
+    ) -> Tuple[List[np.ndarray], List[BBox]]:
+        return imgs, bboxes
+
 
 class Effects:
     """
@@ -112,20 +181,74 @@ class Effects:
             effects = [effects]
         self.effects = effects
 
+    @property
+    def array_native(self) -> bool:
+        return all(getattr(e, "array_native", False) for e in self.effects)
+
+    @property
+    def inplace(self) -> bool:
+        return any(getattr(e, "inplace", False) for e in self.effects)
+
     def __call__(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
         """Make Effects callable to be compatible with OneOf selector"""
-        return self.apply_effects(img, text_bbox)
+        # Caller copied the array if it is not safe to change it, see inplace
+        return self.apply_effects(img, text_bbox, inplace=True)
 
-    def apply_effects(self, img: PILImage, bbox: BBox) -> Tuple[PILImage, BBox]:
+    def apply_effects(
+        self, img: Union[PILImage, np.ndarray], bbox: BBox, inplace: bool = False
+    ) -> Tuple[Union[PILImage, np.ndarray], BBox]:
         """
+        Image is converted between PIL image and array only when the next effect
+        needs the other representation, output has the same type as input img.
 
         Args:
-            img:
+            img: PIL image or (height, width, 4) RGBA uint8 array
             bbox: bbox of text on input Image
+            inplace: input array can be changed by inplace effects, otherwise it is copied before them
 
         Returns:
 
         """
+        input_is_array = isinstance(img, np.ndarray)
+        # whether img can be changed by inplace effects
+        owned = inplace or not input_is_array
+
         for e in self.effects:
-            img, bbox = e(img, bbox)
+            if getattr(e, "array_native", False):
+                if not isinstance(img, np.ndarray):
+                    img = np.array(img)
+                    owned = True
+                elif getattr(e, "inplace", False) and not owned:
+                    img = img.copy()
+                    owned = True
+            elif isinstance(img, np.ndarray):
+                img = to_pil_image(img)
+
+            ret, bbox = e(img, bbox)
+            if ret is not img:
+                owned = True
+            img = ret
+
+        if input_is_array and not isinstance(img, np.ndarray):
+            img = np.array(img)
+        elif not input_is_array and isinstance(img, np.ndarray):
+            img = to_pil_image(img)
         return img, bbox
+
+    def apply_batch(
+        self, imgs: List[np.ndarray], bboxes: List[BBox]
+    ) -> Tuple[List[np.ndarray], List[BBox]]:
+        """
+        Apply effects on a batch of (height, width, 4) RGBA uint8 arrays, each effect
+        processes the whole batch before the next one. Arrays may be changed in place.
+
+        Args:
+            imgs:
+            bboxes: bbox of text on each image
+
+        Returns:
+
+        """
+        for e in self.effects:
+            imgs, bboxes = e.apply_batch(imgs, bboxes)
+        return imgs, bboxes
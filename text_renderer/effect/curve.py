@@ -1,20 +1,22 @@
+from functools import lru_cache
 from typing import Tuple
 
 import cv2
 import numpy as np
-from PIL import Image
 
 from text_renderer.utils.bbox import BBox
-from text_renderer.utils.types import PILImage
 from .base_effect import Effect
 
 
 class Curve(Effect):
+    array_native = True
+
     def __init__(
         self,
         p=0.5,
         period: float = 180,
         amplitude: Tuple[float, float] = (1, 5),
+        amplitude_step: float = 0.1,
     ):
         """
 
@@ -25,49 +27,69 @@ class Curve(Effect):
         period : float
             in degree
         amplitude : tuple
+        amplitude_step : float
+            Sampled amplitude is rounded to a multiple of amplitude_step,
+            so remap grids of images with the same size can be reused
         """
 
         super().__init__(p)
         assert amplitude[0] < amplitude[1]
         self.period = period
         self.amplitude = amplitude
+        self.amplitude_step = amplitude_step
 
-    def apply(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
+    def apply_array(
+        self, word_img: np.ndarray, text_bbox: BBox
+    ) -> Tuple[np.ndarray, BBox]:
         max_val = np.random.uniform(*self.amplitude)
+        if self.amplitude_step > 0:
+            max_val = round(max_val / self.amplitude_step) * self.amplitude_step
 
-        word_img = np.array(img)
         h, w = word_img.shape[:2]
 
-        img_x = np.zeros((h, w), np.float32)
-        img_y = np.zeros((h, w), np.float32)
+        img_x, img_y, offsets = _remap_grid(w, h, self.period, max_val)
 
         xmin = text_bbox.left
         xmax = text_bbox.right
         ymin = text_bbox.top
         ymax = text_bbox.bottom
 
+        # Row ymin moves up by the min offset, row ymax moves down by the max offset
         remap_y_min = ymin
         remap_y_max = ymax
-
-        for y in range(h):
-            for x in range(w):
-                remaped_y = y + self._remap_y(x, max_val)
-
-                if y == ymin:
-                    if remaped_y < remap_y_min:
-                        remap_y_min = remaped_y
-
-                if y == ymax:
-                    if remaped_y > remap_y_max:
-                        remap_y_max = remaped_y
-
-                img_y[y, x] = remaped_y
-                img_x[y, x] = x
+        if 0 <= ymin < h:
+            remap_y_min = min(ymin, ymin + int(offsets.min()))
+        if 0 <= ymax < h:
+            remap_y_max = max(ymax, ymax + int(offsets.max()))
 
         dst = cv2.remap(word_img, img_x, img_y, cv2.INTER_CUBIC)
         bbox = BBox(left=xmin, top=remap_y_min, right=xmax, bottom=remap_y_max)
         bbox = bbox.offset((bbox.left, bbox.top), (0, 0))
-        return Image.fromarray(dst), bbox
-
-    def _remap_y(self, x, max_val):
-        return int(max_val * np.math.sin(2 * 3.14 * x / self.period))
+        return dst, bbox
+
+
+def _remap_offsets(x, period: float, max_val: float):
+    # astype(int) truncates toward zero, same as int()
+    return (max_val * np.sin(2 * 3.14 * np.asarray(x) / period)).astype(int)
+
+
+@lru_cache(maxsize=64)
+def _remap_grid(
+    width: int, height: int, period: float, max_val: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build cv2.remap grids of Curve, cached by image size, period and amplitude.
+    Returned arrays are shared, they are readonly
+
+    Returns:
+        map_x, map_y: (height, width) float32
+        offsets: (width,) int, y offset of each column
+    """
+    offsets = _remap_offsets(np.arange(width), period, max_val)
+    map_x = np.broadcast_to(np.arange(width, dtype=np.float32), (height, width))
+    map_y = np.arange(height, dtype=np.float32)[:, None] + offsets.astype(np.float32)
+    # cv2.remap needs contiguous maps
+    map_x = np.ascontiguousarray(map_x)
+    for it in (map_x, map_y, offsets):
+        it.setflags(write=False)
+    return map_x, map_y, offsets
@@ -1,12 +1,16 @@
 import random
 from typing import Tuple
 
+import numpy as np
+
 from text_renderer.utils.bbox import BBox
-from text_renderer.utils.types import PILImage
 from .base_effect import Effect
 
 
 class DropoutHorizontal(Effect):
+    array_native = True
+    inplace = True
+
     def __init__(self, p=0.5, num_line=3, thickness: int = 3):
         """
 
@@ -22,13 +26,14 @@ class DropoutHorizontal(Effect):
         self.num_line = num_line
         self.thickness = thickness
 
-    def apply(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
-        pim = img.load()
+    def apply_array(
+        self, np_img: np.ndarray, text_bbox: BBox
+    ) -> Tuple[np.ndarray, BBox]:
+        height, width = np_img.shape[:2]
 
         for _ in range(self.num_line):
-            row = random.randint(1, img.height - self.thickness - 1)
-            for i in range(self.thickness):
-                for col in range(img.width):
-                    self.fix_pick(pim, col, row + i, (0, 20))
+            row = random.randint(1, height - self.thickness - 1)
+            value = self.fix_pick_array((self.thickness, width), (0, 20))
+            np_img[row : row + self.thickness] = value[:, :, None]
 
-        return img, text_bbox
+        return np_img, text_bbox
@@ -4,12 +4,14 @@ from typing import Tuple
 import numpy as np
 
 from text_renderer.utils.bbox import BBox
-from text_renderer.utils.types import PILImage
 
 from .base_effect import Effect
 
 
 class DropoutRand(Effect):
+    array_native = True
+    inplace = True
+
     def __init__(self, p=0.5, dropout_p=(0.2, 0.4)):
         """
 
@@ -24,24 +26,21 @@ class DropoutRand(Effect):
         super().__init__(p)
         self.dropout_p = dropout_p
 
-    def apply(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
-        pim = img.load()
-
-        alpha_channel = np.array(img).astype(np.uint8)[:, :, 3]
-        nonzero_idxes = np.argwhere(alpha_channel != 0)
+    def apply_array(
+        self, np_img: np.ndarray, text_bbox: BBox
+    ) -> Tuple[np.ndarray, BBox]:
+        # index by (row, col) instead of a flattened view, np_img may not be contiguous
+        rows, cols = np.nonzero(np_img[:, :, 3])
 
-        nonzero_count = nonzero_idxes.shape[0]
+        nonzero_count = rows.shape[0]
         random_dropout_count = random.randint(
             int(nonzero_count * self.dropout_p[0]),
             int(nonzero_count * self.dropout_p[1]),
         )
         shuffled = np.random.permutation(nonzero_count)
-        shuffled = shuffled[:random_dropout_count]
+        dropout_idxes = shuffled[:random_dropout_count]
+        rows, cols = rows[dropout_idxes], cols[dropout_idxes]
 
-        for i in shuffled:
-            y, x = nonzero_idxes[i]
-            col = int(x)
-            row = int(y)
-            self.rand_pick(pim, col, row)
+        np_img[rows, cols] = self.rand_pick_array(np_img[rows, cols])
 
-        return img, text_bbox
+        return np_img, text_bbox
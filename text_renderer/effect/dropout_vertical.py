@@ -1,13 +1,17 @@
 import random
 from typing import Tuple
 
+import numpy as np
+
 from text_renderer.utils.bbox import BBox
-from text_renderer.utils.types import PILImage
 
 from .base_effect import Effect
 
 
 class DropoutVertical(Effect):
+    array_native = True
+    inplace = True
+
     def __init__(self, p=0.5, num_line=8, thickness: int = 3):
         """
 
@@ -23,13 +27,14 @@ class DropoutVertical(Effect):
         self.num_line = num_line
         self.thickness = thickness
 
-    def apply(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
-        pim = img.load()
+    def apply_array(
+        self, np_img: np.ndarray, text_bbox: BBox
+    ) -> Tuple[np.ndarray, BBox]:
+        height, width = np_img.shape[:2]
 
         for _ in range(self.num_line):
-            col = random.randint(1, img.width - self.thickness - 1)
-            for i in range(self.thickness):
-                for row in range(img.height):
-                    self.fix_pick(pim, col + i, row, (0, 20))
+            col = random.randint(1, width - self.thickness - 1)
+            value = self.fix_pick_array((height, self.thickness), (0, 20))
+            np_img[:, col : col + self.thickness] = value[:, :, None]
 
-        return img, text_bbox
+        return np_img, text_bbox
@@ -1,12 +1,13 @@
-from typing import Tuple
+from typing import Dict, List, Tuple
 
-from PIL import Image
+import cv2
 from imgaug.augmenters import Augmenter
 import imgaug.augmenters as iaa
+import imgaug.random as iarandom
 import numpy as np
 
 from text_renderer.utils.bbox import BBox
-from text_renderer.utils.types import PILImage
+from text_renderer.utils.utils import prob
 
 from .base_effect import Effect
 
@@ -16,17 +17,97 @@ class ImgAugEffect(Effect):
     Apply imgaug(https://github.com/aleju/imgaug) Augmenter on image.
     """
 
-    def __init__(self, p=1.0, aug: Augmenter = None):
+    array_native = True
+
+    def __init__(self, p=1.0, aug: Augmenter = None, pad_batch: bool = False):
+        """
+
+        Parameters
+        ----------
+        p : float
+            Probability of apply this effect
+        aug : Augmenter
+            imgaug augmenter
+        pad_batch : bool
+            Used by :meth:`apply_batch`. If True, images of different sizes are padded by reflection
+            to the largest size, augmented in one call and cropped back. Only suitable for augmenters
+            which do not move pixels, e.g. blur, noise, color, contrast.
+            If False, only images of the same size are augmented in one call
+        """
         super().__init__(p)
         self.aug = aug
+        self.pad_batch = pad_batch
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Pickled augmenter gets a copy of imgaug's global RNG, e.g. in spawned render processes,
+        # remember which ones used the global RNG so seeding the global RNG still controls them
+        state["_global_rng_augs"] = [
+            i
+            for i, aug in enumerate(self._all_augs())
+            if aug.random_state.is_global_rng()
+        ]
+        return state
+
+    def __setstate__(self, state):
+        global_rng_augs = state.pop("_global_rng_augs", [])
+        self.__dict__.update(state)
+        augs = self._all_augs()
+        for i in global_rng_augs:
+            augs[i].random_state = iarandom.get_global_rng()
+
+    def _all_augs(self) -> List[Augmenter]:
+        if self.aug is None:
+            return []
+        return [self.aug] + self.aug.get_all_children(flat=True)
 
-    def apply(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
+    def apply_array(
+        self, word_img: np.ndarray, text_bbox: BBox
+    ) -> Tuple[np.ndarray, BBox]:
         if self.aug is None:
-            return img, text_bbox
+            return word_img, text_bbox
 
-        word_img = np.array(img)
         # TODO: test self.aug.augment_bounding_boxes()
-        return Image.fromarray(self.aug.augment_image(word_img)), text_bbox
+        return self.aug.augment_image(word_img), text_bbox
+
+    def apply_batch(
+        self, imgs: List[np.ndarray], text_bboxes: List[BBox]
+    ) -> Tuple[List[np.ndarray], List[BBox]]:
+        """
+        Augment images by one ``augment_images`` call per group, so imgaug samples parameters
+        and sets up random state once per group instead of once per image.
+        Images are grouped by shape, or by channels if pad_batch is True
+        """
+        if self.aug is None:
+            return imgs, text_bboxes
+
+        groups: Dict[tuple, List[int]] = {}
+        for i, img in enumerate(imgs):
+            if prob(self.p):
+                key = img.shape[2:] if self.pad_batch else img.shape
+                groups.setdefault(key, []).append(i)
+
+        imgs = list(imgs)
+        for idxes in groups.values():
+            height = max(imgs[i].shape[0] for i in idxes)
+            width = max(imgs[i].shape[1] for i in idxes)
+            batch = np.stack([self._pad(imgs[i], height, width) for i in idxes])
+            batch = self.aug.augment_images(batch)
+            for i, img in zip(idxes, batch):
+                # crop of padded image is not contiguous, following effects may reshape it
+                imgs[i] = np.ascontiguousarray(
+                    img[: imgs[i].shape[0], : imgs[i].shape[1]]
+                )
+        return imgs, text_bboxes
+
+    @staticmethod
+    def _pad(img: np.ndarray, height: int, width: int) -> np.ndarray:
+        pad_h = height - img.shape[0]
+        pad_w = width - img.shape[1]
+        if pad_h == 0 and pad_w == 0:
+            return img
+        # same as the default border of cv2 filters, keeps edge pixels of blur close to unpadded image
+        return cv2.copyMakeBorder(img, 0, pad_h, 0, pad_w, cv2.BORDER_REFLECT_101)
 
 
 class Emboss(ImgAugEffect):
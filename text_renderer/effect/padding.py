@@ -3,14 +3,14 @@ from typing import Tuple
 import numpy as np
 
 from text_renderer.utils.bbox import BBox
-from text_renderer.utils.draw_utils import transparent_img
-from text_renderer.utils.types import PILImage
 from text_renderer.utils.utils import random_xy_offset
 
 from .base_effect import Effect
 
 
 class Padding(Effect):
+    array_native = True
+
     def __init__(
         self, p=0.5, w_ratio=(0.0, 0.05), h_ratio=(0.0, 0.3), center: bool = False
     ):
@@ -33,20 +33,24 @@ class Padding(Effect):
         self.h_ratio = h_ratio
         self.center = center
 
-    def apply(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
+    def apply_array(
+        self, np_img: np.ndarray, text_bbox: BBox
+    ) -> Tuple[np.ndarray, BBox]:
+        height, width = np_img.shape[:2]
         w_ratio = np.random.uniform(*self.w_ratio)
         h_ratio = np.random.uniform(*self.h_ratio)
-        new_w = int(img.width + img.width * w_ratio)
-        new_h = int(img.height + img.height * h_ratio)
+        new_w = int(width + width * w_ratio)
+        new_h = int(height + height * h_ratio)
 
-        new_img = transparent_img((new_w, new_h))
+        # transparent image
+        new_img = np.zeros((new_h, new_w) + np_img.shape[2:], dtype=np_img.dtype)
 
         if self.center:
-            xy = (int((new_w - img.width) / 2), int((new_h - img.height) / 2))
+            xy = (int((new_w - width) / 2), int((new_h - height) / 2))
         else:
-            xy = random_xy_offset(img.size, (new_w, new_h))
+            xy = random_xy_offset((width, height), (new_w, new_h))
 
-        new_img.paste(img, xy)
+        new_img[xy[1] : xy[1] + height, xy[0] : xy[0] + width] = np_img
 
         new_bbox = text_bbox.move_origin(xy)
         return new_img, new_bbox
@@ -1,5 +1,7 @@
 import typing
-from typing import Tuple, List
+from typing import Dict, List, Tuple
+
+import numpy as np
 
 if typing.TYPE_CHECKING:
     from text_renderer.effect import Effect
@@ -23,8 +25,36 @@ class Selector:
         """
         self.effects = effects
 
+    @property
+    def array_native(self) -> bool:
+        return all(getattr(e, "array_native", False) for e in self.effects)
+
+    @property
+    def inplace(self) -> bool:
+        return any(getattr(e, "inplace", False) for e in self.effects)
+
 
 class OneOf(Selector):
     def __call__(self, img: PILImage, text_bbox: BBox) -> Tuple[PILImage, BBox]:
         effect = random_choice(self.effects)
         return effect(img, text_bbox)
+
+    def apply_batch(
+        self, imgs: List[np.ndarray], bboxes: List[BBox]
+    ) -> Tuple[List[np.ndarray], List[BBox]]:
+        """
+        Select an effect for each image, images selected the same effect are applied as one batch
+        """
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(imgs)):
+            groups.setdefault(np.random.randint(0, len(self.effects)), []).append(i)
+
+        imgs, bboxes = list(imgs), list(bboxes)
+        for effect_idx, idxes in groups.items():
+            out_imgs, out_bboxes = self.effects[effect_idx].apply_batch(
+                [imgs[i] for i in idxes], [bboxes[i] for i in idxes]
+            )
+            for i, img, bbox in zip(idxes, out_imgs, out_bboxes):
+                imgs[i] = img
+                bboxes[i] = bbox
+        return imgs, bboxes
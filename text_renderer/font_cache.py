@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from loguru import logger
+
+DEFAULT_FONT_CACHE_DIR = (
+    Path(
+        os.environ.get(
+            "TEXT_RENDERER_CACHE_DIR", Path.home() / ".cache" / "text_renderer"
+        )
+    )
+    / "fonts"
+)
+
+
+class FontCache:
+    """
+    Persistent cache of font capabilities used by :class:`~text_renderer.font_manager.FontManager`:
+
+    - chars in cmap of the font
+    - chars in a chars file which are in cmap but rendered as empty mask
+
+    One json file per font, keyed by font path, chars are stored as code points. An entry is valid only if mtime and size of the font file
+    are unchanged, so edited or replaced fonts are parsed again. Empty chars are stored per charset hash.
+
+    Files are replaced atomically, so render processes can read and write the cache at the same time.
+    If cache_dir can not be written (e.g. read-only $HOME), entries are only kept in memory.
+    """
+
+    def __init__(self, cache_dir: Path = DEFAULT_FONT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        # font_path -> cache entry
+        self._entries: Dict[str, Dict] = {}
+        self._writable = True
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            self._disable_write(e)
+
+    @staticmethod
+    def charset_key(charset: Set[str]) -> str:
+        return hashlib.sha1(
+            "".join(sorted(charset)).encode("utf-8", "surrogatepass")
+        ).hexdigest()
+
+    def get_cmap_chars(self, font_path: str) -> Optional[Set[str]]:
+        entry = self._get_entry(font_path)
+        if entry is None:
+            return None
+        return set(map(chr, entry["cmap"]))
+
+    def set_cmap_chars(self, font_path: str, chars: Set[str]):
+        # cmap changed means font changed, empty chars of the old font are dropped
+        entry = self._new_entry(font_path)
+        entry["cmap"] = sorted(map(ord, chars))
+        self._put_entry(font_path, entry)
+
+    def get_empty_chars(self, font_path: str, charset_key: str) -> Optional[Set[str]]:
+        entry = self._get_entry(font_path)
+        if entry is None or charset_key not in entry["empty_chars"]:
+            return None
+        return set(map(chr, entry["empty_chars"][charset_key]))
+
+    def set_empty_chars(self, font_path: str, charset_key: str, chars: Set[str]):
+        entry = self._get_entry(font_path)
+        if entry is None:
+            logger.warning(
+                f"cmap of {font_path} is not cached, skip caching empty chars"
+            )
+            return
+        entry["empty_chars"][charset_key] = sorted(map(ord, chars))
+        self._put_entry(font_path, entry)
+
+    def _cache_path(self, font_path: str) -> Path:
+        key = hashlib.sha1(os.path.abspath(font_path).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json"
+
+    def _new_entry(self, font_path: str) -> Dict:
+        stat = os.stat(font_path)
+        return {
+            "path": os.path.abspath(font_path),
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "cmap": [],
+            "empty_chars": {},
+        }
+
+    def _get_entry(self, font_path: str) -> Optional[Dict]:
+        entry = self._entries.get(font_path)
+        if entry is None:
+            cache_path = self._cache_path(font_path)
+            if not cache_path.exists():
+                return None
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignore broken font cache {cache_path}: {e}")
+                return None
+
+        stat = os.stat(font_path)
+        if entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            self._entries.pop(font_path, None)
+            return None
+
+        self._entries[font_path] = entry
+        return entry
+
+    def _put_entry(self, font_path: str, entry: Dict):
+        self._entries[font_path] = entry
+        if not self._writable:
+            return
+
+        cache_path = self._cache_path(font_path)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            self._disable_write(e)
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _disable_write(self, e: OSError):
+        logger.warning(
+            f"Font cache dir {self.cache_dir} is not writable, run without cache: {e}"
+        )
+        self._writable = False
@@ -1,21 +1,85 @@
+import multiprocessing as mp
+import os
 import random
-from functools import lru_cache
 from pathlib import Path
-from typing import List, Set, Tuple, Dict, Optional
+from typing import List, Set, Tuple, Dict, Optional, Iterator
 
 from PIL import ImageFont
 from PIL.ImageFont import FreeTypeFont
 from fontTools.ttLib import TTFont, TTCollection
 from loguru import logger
+from tqdm import tqdm
 
-from text_renderer.utils.errors import PanicError
+from text_renderer.font_cache import DEFAULT_FONT_CACHE_DIR, FontCache
+from text_renderer.utils.errors import PanicError, RetryError
+from text_renderer.utils.lru_cache import LRUCache
 from text_renderer.utils.utils import load_chars_file
 
 
+class FontFaceCache(LRUCache):
+    """
+    LRU cache of FreeTypeFont keyed by (font_path, font_size), one per process and shared by all FontManager,
+    so corpora using the same fonts open each font face once.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+
+        Parameters
+        ----------
+        maxsize : int
+            Max number of font faces kept open. Least recently used face is closed when exceeded
+        """
+        super().__init__(maxsize)
+
+    def get(self, font_path: str, font_size: int) -> FreeTypeFont:
+        return self.get_or_create(
+            (font_path, font_size), lambda: ImageFont.truetype(font_path, font_size)
+        )
+
+
+# Set TEXT_RENDERER_FONT_FACE_CACHE_SIZE or call font_face_cache.resize() to change the size
+font_face_cache = FontFaceCache(
+    int(os.environ.get("TEXT_RENDERER_FONT_FACE_CACHE_SIZE", 1024))
+)
+
+
+def _find_empty_chars(task: Tuple[str, Set]) -> Tuple[str, Set]:
+    """
+    Find chars rendered as empty mask by the font
+
+    Args:
+        task: (font_path, chars to check)
+
+    Returns:
+        (font_path, empty chars)
+    """
+    font_path, chars = task
+    white_list = [" "]
+
+    font = ImageFont.truetype(font_path, 10)
+    empty_chars = set()
+    for c in chars:
+        if c not in white_list and font.getmask(c).getbbox() is None:
+            empty_chars.add(c)
+    return font_path, empty_chars
+
+
 class FontManager:
     def __init__(
-        self, font_dir: Path, font_list_file: Optional[Path], font_size: Tuple[int, int]
+        self,
+        font_dir: Path,
+        font_list_file: Optional[Path],
+        font_size: Tuple[int, int],
+        cache_dir: Optional[Path] = DEFAULT_FONT_CACHE_DIR,
     ):
+        """
+
+        Parameters
+        ----------
+        cache_dir : Path
+            Directory of :class:`~text_renderer.font_cache.FontCache`. Set None to disable cache
+        """
         assert font_size[0] < font_size[1]
         self.font_size_min = font_size[0]
         self.font_size_max = font_size[1]
@@ -23,6 +87,10 @@ class FontManager:
         self.font_support_chars_cache: Dict[str, Set] = {}
         # Created in self.update_font_support_chars(), used to filter font_path
         self.font_support_chars_intersection_with_chars: Dict[str, Set] = {}
+        self.font_cache = FontCache(cache_dir) if cache_dir is not None else None
+        # char -> bitset of fonts support the char, bit i is self.font_paths[i].
+        # Built on first use, reset when font_paths or supported chars changed
+        self._char_fonts: Optional[Dict[str, int]] = None
 
         if font_list_file is not None:
             with open(str(font_list_file), "r", encoding="utf-8") as f:
@@ -45,8 +113,28 @@ class FontManager:
 
         self._load_font_support_chars()
 
-    def get_font(self) -> Tuple[FreeTypeFont, Set, str]:
-        font_path = random.choice(self.font_paths)
+    def get_font(self, text: Optional[str] = None) -> Tuple[FreeTypeFont, Set, str]:
+        """
+        Randomly pick a font and font size
+
+        Parameters
+        ----------
+        text : str
+            If not None, only pick from fonts support all chars in text
+
+        Raises
+        ------
+        RetryError
+            No font supports all chars in text
+        """
+        if text is None:
+            font_paths = self.font_paths
+        else:
+            font_paths = self.get_support_font_paths(text)
+            if len(font_paths) == 0:
+                raise RetryError(f"No font supports all chars in text: {text}")
+
+        font_path = random.choice(font_paths)
         font_size = random.randint(self.font_size_min, self.font_size_max)
 
         font = self._get_font(font_path, font_size)
@@ -54,6 +142,29 @@ class FontManager:
 
         return font, font_support_chars, font_path
 
+    def get_support_font_paths(self, text: str) -> List[str]:
+        """
+        Fonts support all chars in text, found by intersecting bitsets of each char
+        """
+        if self._char_fonts is None:
+            self._build_char_fonts()
+
+        fonts = (1 << len(self.font_paths)) - 1
+        for c in set(text):
+            fonts &= self._char_fonts.get(c, 0)
+            if fonts == 0:
+                return []
+
+        return [p for i, p in enumerate(self.font_paths) if fonts >> i & 1]
+
+    def _build_char_fonts(self):
+        char_fonts = {}
+        for i, font_path in enumerate(self.font_paths):
+            bit = 1 << i
+            for c in self.font_support_chars_cache[font_path]:
+                char_fonts[c] = char_fonts.get(c, 0) | bit
+        self._char_fonts = char_fonts
+
     def check_support(self, text: str, chars: Set) -> Tuple[bool, Set]:
         # Check whether all chars in text exist in chars
         text_set = set(text)
@@ -64,23 +175,34 @@ class FontManager:
 
     def _load_font_support_chars(self):
         for font_path in self.font_paths:
-            ttf = self._load_ttfont(font_path)
+            supported_chars = None
+            if self.font_cache is not None:
+                supported_chars = self.font_cache.get_cmap_chars(font_path)
 
-            chars_int = set()
-            try:
-                for table in ttf["cmap"].tables:
-                    for k, v in table.cmap.items():
-                        chars_int.add(k)
-            except AssertionError as e:
-                logger.error(f"Load font file {font_path} failed, skip it. Error: {e}")
+            if supported_chars is None:
+                supported_chars = self._parse_font_support_chars(font_path)
+                if self.font_cache is not None:
+                    self.font_cache.set_cmap_chars(font_path, supported_chars)
 
-            supported_chars = set([chr(c_int) for c_int in chars_int])
+            self.font_support_chars_cache[font_path] = supported_chars
 
-            ttf.close()
+    def _parse_font_support_chars(self, font_path: str) -> Set[str]:
+        ttf = self._load_ttfont(font_path)
 
-            self.font_support_chars_cache[font_path] = supported_chars
+        chars_int = set()
+        try:
+            for table in ttf["cmap"].tables:
+                for k, v in table.cmap.items():
+                    chars_int.add(k)
+        except AssertionError as e:
+            logger.error(f"Load font file {font_path} failed, skip it. Error: {e}")
 
-    def update_font_support_chars(self, chars_file):
+        supported_chars = set([chr(c_int) for c_int in chars_int])
+
+        ttf.close()
+        return supported_chars
+
+    def update_font_support_chars(self, chars_file, num_workers: int = 0):
         """
         Although some fonts have a specific character in the cmap, the rendered text is blank on the image.
 
@@ -88,21 +210,37 @@ class FontManager:
         ----------
         chars_file: Path
             one char per line
+        num_workers: int
+            Number of processes used to check fonts not in cache, one font per task.
+            0 checks fonts in current process. Can not be used inside daemonic processes(e.g. render processes)
         """
-        white_list = [" "]
-
         charset = load_chars_file(chars_file)
+        charset_key = FontCache.charset_key(charset)
+
+        font_empty_chars: Dict[str, Set] = {}
+        tasks = []
+        for font_path in self.font_paths:
+            empty_chars = None
+            if self.font_cache is not None:
+                empty_chars = self.font_cache.get_empty_chars(font_path, charset_key)
+
+            if empty_chars is None:
+                tasks.append(
+                    (font_path, self.font_support_chars_cache[font_path] & charset)
+                )
+            else:
+                font_empty_chars[font_path] = empty_chars
+
+        for font_path, empty_chars in self._check_fonts(tasks, num_workers):
+            font_empty_chars[font_path] = empty_chars
+            if self.font_cache is not None:
+                self.font_cache.set_empty_chars(font_path, charset_key, empty_chars)
+
         for font_path in self.font_paths:
-            removed_chars = []
-            font = self._get_font(font_path, 10)
             chars = self.font_support_chars_cache[font_path].copy()
-            for c in chars & charset:
-                bbox = font.getmask(c).getbbox()
-                if (
-                    c not in white_list
-                    and bbox is None
-                    and c in self.font_support_chars_cache[font_path]
-                ):
+            removed_chars = []
+            for c in font_empty_chars[font_path]:
+                if c in self.font_support_chars_cache[font_path]:
                     self.font_support_chars_cache[font_path].remove(c)
                     removed_chars.append(c)
 
@@ -119,6 +257,26 @@ class FontManager:
             self.font_support_chars_intersection_with_chars[font_path] = (
                 self.font_support_chars_cache[font_path] & chars
             )
+        self._char_fonts = None
+
+    @staticmethod
+    def _check_fonts(
+        tasks: List[Tuple[str, Set]], num_workers: int
+    ) -> Iterator[Tuple[str, Set]]:
+        if len(tasks) == 0:
+            return
+
+        if num_workers == 0 or len(tasks) == 1:
+            yield from map(_find_empty_chars, tasks)
+            return
+
+        logger.info(f"Check {len(tasks)} fonts with {num_workers} processes")
+        with mp.Pool(min(num_workers, len(tasks))) as pool:
+            yield from tqdm(
+                pool.imap_unordered(_find_empty_chars, tasks),
+                total=len(tasks),
+                desc="Check fonts",
+            )
 
     def filter_font_path(self, min_support_chars: int):
         """
@@ -147,6 +305,7 @@ class FontManager:
                 f"Filter font path: {len(self.font_paths)} -> {len(new_font_paths)}"
             )
             self.font_paths = new_font_paths
+            self._char_fonts = None
 
     def _load_ttfont(self, font_path: str) -> TTFont:
         """
@@ -170,7 +329,5 @@ class FontManager:
 
             return ttf
 
-    @lru_cache()
     def _get_font(self, font_path: str, font_size: int) -> FreeTypeFont:
-        font = ImageFont.truetype(font_path, font_size)
-        return font
+        return font_face_cache.get(font_path, font_size)
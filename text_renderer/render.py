@@ -1,4 +1,5 @@
-from typing import Tuple, List
+from dataclasses import dataclass
+from typing import Callable, Tuple, List, Optional
 
 from PIL import Image
 from loguru import logger
@@ -7,7 +8,7 @@ import cv2
 import numpy as np
 from PIL.Image import Image as PILImage
 from PIL.ImageFont import FreeTypeFont
-from tenacity import retry
+from tenacity import retry, retry_if_not_exception_type
 
 from text_renderer.bg_manager import BgManager
 from text_renderer.config import RenderCfg
@@ -20,6 +21,53 @@ from text_renderer.utils.font_text import FontText
 from text_renderer.utils.types import FontColor, is_list
 
 
+@dataclass
+class RenderBatch:
+    """
+    Images rendered by :meth:`Render.render_batch`
+
+    Attributes:
+        labels: text of each image
+        images: list of (height, width) or (height, width, 3) uint8 arrays, None if packed
+        tensor: (n, height, max_width) or (n, height, max_width, 3) uint8 array,
+            each image is padded with 0 on the right. None if not packed
+        widths: (n,) int array, width of each image in tensor. None if not packed
+    """
+
+    labels: List[str]
+    images: Optional[List[np.ndarray]] = None
+    tensor: Optional[np.ndarray] = None
+    widths: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @staticmethod
+    def pack(images: List[np.ndarray], labels: List[str]) -> "RenderBatch":
+        widths = np.array([it.shape[1] for it in images], dtype=np.int64)
+        if not images:
+            return RenderBatch(
+                labels=labels, tensor=np.zeros((0, 0, 0), np.uint8), widths=widths
+            )
+
+        # all images have the same height after Render.norm
+        shape = (len(images), images[0].shape[0], int(widths.max())) + images[0].shape[
+            2:
+        ]
+        tensor = np.zeros(shape, dtype=np.uint8)
+        for i, image in enumerate(images):
+            tensor[i, :, : image.shape[1]] = image
+        return RenderBatch(labels=labels, tensor=tensor, widths=widths)
+
+    def unpack(self) -> List[np.ndarray]:
+        """
+        Images in the batch, views of tensor if packed
+        """
+        if self.tensor is None:
+            return self.images
+        return [image[:, :width] for image, width in zip(self.tensor, self.widths)]
+
+
 class Render:
     def __init__(self, cfg: RenderCfg):
         self.cfg = cfg
@@ -45,48 +93,149 @@ class Render:
 
         self.bg_manager = BgManager(cfg.bg_dir, cfg.pre_load_bg_img)
 
-    @retry
+    # PanicError is not random, retrying it would never end
+    @retry(retry=retry_if_not_exception_type(PanicError))
     def __call__(self, *args, **kwargs) -> Tuple[np.ndarray, str]:
+        img, text, cropped_bg, transformed_text_mask = self.gen_sample()
         try:
-            if self._should_apply_layout():
-                img, text, cropped_bg, transformed_text_mask = self.gen_multi_corpus()
-            else:
-                img, text, cropped_bg, transformed_text_mask = self.gen_single_corpus()
-
             if self.cfg.render_effects is not None:
                 img, _ = self.cfg.render_effects.apply_effects(
                     img, BBox.from_size(img.size)
                 )
 
-            if self.cfg.return_bg_and_mask:
-                gray_text_mask = np.array(transformed_text_mask.convert("L"))
-                _, gray_text_mask = cv2.threshold(
-                    gray_text_mask, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
+            return self.to_output(img, cropped_bg, transformed_text_mask), text
+        except Exception as e:
+            logger.exception(e)
+            raise e
+
+    def render_batch(
+        self,
+        n: int,
+        before_sample: Callable[[int], None] = None,
+        pack: bool = False,
+    ) -> "RenderBatch":
+        """
+        Render n images. If ``RenderCfg.batch_render_effects`` is True, render_effects
+        are applied on all images at once by :meth:`~text_renderer.effect.Effects.apply_batch`.
+        If that fails, they are applied on each image on its own, so one bad sample does not fail the batch
+
+        Args:
+            n: number of images
+            before_sample: called with index of the sample in batch before rendering it, e.g. to seed it
+            pack: pack images into one zero padded tensor, requires fixed ``RenderCfg.height``
+
+        Returns:
+            RenderBatch
+        """
+        if pack and self.cfg.height == -1:
+            raise PanicError("pack requires RenderCfg.height != -1")
+
+        if not self.cfg.batch_render_effects or self.cfg.render_effects is None:
+            images, labels = [], []
+            for i in range(n):
+                if before_sample is not None:
+                    before_sample(i)
+                image, label = self()
+                images.append(image)
+                labels.append(label)
+        else:
+            samples = []
+            for i in range(n):
+                if before_sample is not None:
+                    before_sample(i)
+                samples.append(self.gen_sample())
+
+            labels = [it[1] for it in samples]
+            try:
+                imgs, _ = self.cfg.render_effects.apply_batch(
+                    [np.array(it[0]) for it in samples],
+                    [BBox.from_size(it[0].size) for it in samples],
                 )
-                transformed_text_mask = Image.fromarray(255 - gray_text_mask)
+                images = [
+                    self.to_output(utils.to_pil_image(img), cropped_bg, text_mask)
+                    for img, (_, _, cropped_bg, text_mask) in zip(imgs, samples)
+                ]
+            except PanicError:
+                raise
+            except Exception as e:
+                logger.exception(e)
+                images, labels = self._render_effects_each(samples)
 
-                merge_target = Image.new("RGBA", (img.width * 3, img.height))
-                merge_target.paste(img, (0, 0))
-                merge_target.paste(cropped_bg, (img.width, 0))
-                merge_target.paste(
-                    transformed_text_mask,
-                    (img.width * 2, 0),
-                    mask=transformed_text_mask,
+        if pack:
+            return RenderBatch.pack(images, labels)
+        return RenderBatch(labels=labels, images=images)
+
+    def _render_effects_each(
+        self, samples: List[Tuple[PILImage, str, PILImage, PILImage]]
+    ) -> Tuple[List[np.ndarray], List[str]]:
+        """
+        Apply render_effects on each sample when applying them on the batch failed,
+        a sample which still fails is replaced by a new one like :meth:`__call__` retries
+        """
+        images, labels = [], []
+        for img, text, cropped_bg, text_mask in samples:
+            try:
+                img, _ = self.cfg.render_effects.apply_effects(
+                    img, BBox.from_size(img.size)
                 )
+                image = self.to_output(img, cropped_bg, text_mask)
+            except PanicError:
+                raise
+            except Exception as e:
+                logger.exception(e)
+                image, text = self()
+            images.append(image)
+            labels.append(text)
+        return images, labels
 
-                np_img = np.array(merge_target)
-                np_img = cv2.cvtColor(np_img, cv2.COLOR_RGBA2BGR)
-                np_img = self.norm(np_img)
-            else:
-                img = img.convert("RGB")
-                np_img = np.array(img)
-                np_img = cv2.cvtColor(np_img, cv2.COLOR_RGB2BGR)
-                np_img = self.norm(np_img)
-            return np_img, text
+    @retry(retry=retry_if_not_exception_type(PanicError))
+    def gen_sample(self) -> Tuple[PILImage, str, PILImage, PILImage]:
+        """
+        Render one image without render_effects
+
+        Returns:
+            img, text, cropped_bg, transformed_text_mask
+        """
+        try:
+            if self._should_apply_layout():
+                return self.gen_multi_corpus()
+            return self.gen_single_corpus()
         except Exception as e:
             logger.exception(e)
             raise e
 
+    def to_output(
+        self, img: PILImage, cropped_bg: PILImage, transformed_text_mask: PILImage
+    ) -> np.ndarray:
+        """
+        Convert rendered image to BGR(or gray) array of cfg.height
+        """
+        if self.cfg.return_bg_and_mask:
+            gray_text_mask = np.array(transformed_text_mask.convert("L"))
+            _, gray_text_mask = cv2.threshold(
+                gray_text_mask, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
+            )
+            transformed_text_mask = Image.fromarray(255 - gray_text_mask)
+
+            merge_target = Image.new("RGBA", (img.width * 3, img.height))
+            merge_target.paste(img, (0, 0))
+            merge_target.paste(cropped_bg, (img.width, 0))
+            merge_target.paste(
+                transformed_text_mask,
+                (img.width * 2, 0),
+                mask=transformed_text_mask,
+            )
+
+            np_img = np.array(merge_target)
+            np_img = cv2.cvtColor(np_img, cv2.COLOR_RGBA2BGR)
+            np_img = self.norm(np_img)
+        else:
+            img = img.convert("RGB")
+            np_img = np.array(img)
+            np_img = cv2.cvtColor(np_img, cv2.COLOR_RGB2BGR)
+            np_img = self.norm(np_img)
+        return np_img
+
     def gen_single_corpus(self) -> Tuple[PILImage, str, PILImage, PILImage]:
         font_text = self.corpus.sample()
 
@@ -99,7 +248,10 @@ class Render:
             text_color = self.corpus.cfg.text_color_cfg.get_color(bg)
 
         text_mask = draw_text_on_bg(
-            font_text, text_color, char_spacing=self.corpus.cfg.char_spacing
+            font_text,
+            text_color,
+            char_spacing=self.corpus.cfg.char_spacing,
+            use_glyph_cache=self.corpus.cfg.use_glyph_cache,
         )
 
         if self.cfg.corpus_effects is not None:
@@ -109,8 +261,6 @@ class Render:
 
         if self.cfg.perspective_transform is not None:
             transformer = PerspectiveTransform(self.cfg.perspective_transform)
-            # TODO: refactor this, now we must call get_transformed_size to call gen_warp_matrix
-            _ = transformer.get_transformed_size(text_mask.size)
 
             try:
                 (
@@ -146,7 +296,10 @@ class Render:
             else:
                 _text_color = text_color
             text_mask = draw_text_on_bg(
-                font_text, _text_color, char_spacing=self.corpus[i].cfg.char_spacing
+                font_text,
+                _text_color,
+                char_spacing=self.corpus[i].cfg.char_spacing,
+                use_glyph_cache=self.corpus[i].cfg.use_glyph_cache,
             )
 
             text_bbox = BBox.from_size(text_mask.size)
@@ -174,8 +327,6 @@ class Render:
 
         if self.cfg.perspective_transform is not None:
             transformer = PerspectiveTransform(self.cfg.perspective_transform)
-            # TODO: refactor this, now we must call get_transformed_size to call gen_warp_matrix
-            _ = transformer.get_transformed_size(merged_text_mask.size)
 
             (
                 transformed_text_mask,
@@ -0,0 +1,194 @@
+import itertools
+import multiprocessing as mp
+import os
+import random
+import sys
+from collections import deque
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from text_renderer.config import GeneratorCfg, RenderCfg
+from text_renderer.render import Render
+from text_renderer.utils.utils import get_random_state, seed_sample, set_random_state
+
+# each stream worker will initialize these in _worker_setup
+_render: Optional[Render] = None
+_seed: Optional[int] = None
+_pack: bool = False
+
+
+def _worker_setup(render_cfg: RenderCfg, seed: Optional[int], pack: bool = False):
+    global _render, _seed, _pack
+
+    # Make sure different process has different random seed,
+    # if seed is set, each sample will be seeded in _render_batch
+    np.random.seed()
+    random.seed()
+
+    _render = Render(render_cfg)
+    _seed = seed
+    _pack = pack
+    logger.info(f"Finish setup stream worker: {os.getpid()}")
+
+
+def _render_batch(task: Tuple[int, int]) -> Tuple:
+    """
+    Args:
+        task: (index of first sample, batch_size)
+
+    Returns:
+        (images, labels), or (tensor, widths, labels) if pack is True
+    """
+    start, batch_size = task
+
+    def before_sample(i):
+        if _seed is not None:
+            seed_sample(_seed, 0, start + i)
+
+    batch = _render.render_batch(batch_size, before_sample, pack=_pack)
+    if _pack:
+        return batch.tensor, batch.widths, batch.labels
+    return batch.images, batch.labels
+
+
+def _get_worker_info():
+    """
+    Returns torch.utils.data.get_worker_info() if torch is imported, torch is not a dependency
+    """
+    if "torch" not in sys.modules:
+        return None
+    from torch.utils.data import get_worker_info
+
+    return get_worker_info()
+
+
+class _OwnRandomState:
+    """
+    Render in current process with own global random states, states of the caller are restored on exit
+    """
+
+    def __init__(self):
+        self._state = None
+        self._caller_state = None
+
+    def __enter__(self):
+        self._caller_state = get_random_state()
+        if self._state is not None:
+            set_random_state(self._state)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._state = get_random_state()
+        set_random_state(self._caller_state)
+
+
+class RenderStream:
+    """
+    Yield (images, labels) batches rendered on the fly by a pool of worker processes, no disk round trip.
+    If pack is True, yield (tensor, widths, labels), see :class:`~text_renderer.render.RenderBatch`.
+
+    At most num_workers * prefetch batches are rendered ahead of the consumer.
+    Can be iterated multiple times, each iteration starts a new worker pool.
+
+    Worker processes are started with ``spawn``, so the script using it must be guarded
+    by ``if __name__ == "__main__":``. With num_workers=0, global random generators of the
+    current process are left as they were.
+
+    Inside a PyTorch ``DataLoader`` worker, each worker yields every num_workers-th batch of the stream,
+    so DataLoader workers don't render the same samples.
+    """
+
+    def __init__(
+        self,
+        generator_cfg: GeneratorCfg,
+        num_workers: int = 4,
+        batch_size: int = 32,
+        prefetch: int = 2,
+        num_image: Optional[int] = None,
+        seed: Optional[int] = None,
+        pack: bool = False,
+    ):
+        """
+
+        Parameters
+        ----------
+        generator_cfg : GeneratorCfg
+            Only render_cfg and num_image are used
+        num_workers : int
+            Number of render processes. 0 renders in current process
+        batch_size : int
+            Number of images in one batch, last batch may be smaller
+        prefetch : int
+            Number of batches rendered ahead per worker
+        num_image : int
+            Total number of images, default is generator_cfg.num_image. Set -1 to render forever
+        seed : int
+            If not None, each sample is seeded by (seed, sample index), so the stream does not
+            depend on num_workers
+        pack : bool
+            Pack images of a batch into one zero padded (batch_size, height, max_width[, 3]) uint8 tensor,
+            requires fixed ``RenderCfg.height``
+        """
+        self.render_cfg = generator_cfg.render_cfg
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.num_image = generator_cfg.num_image if num_image is None else num_image
+        self.seed = seed
+        self.pack = pack
+
+    def __iter__(self) -> Iterator[Tuple]:
+        tasks = self._iter_tasks()
+        worker_info = _get_worker_info()
+        if worker_info is not None:
+            tasks = itertools.islice(
+                tasks, worker_info.id, None, worker_info.num_workers
+            )
+
+        if self.num_workers == 0:
+            random_state = _OwnRandomState()
+            with random_state:
+                _worker_setup(self.render_cfg, self.seed, self.pack)
+            for task in tasks:
+                with random_state:
+                    batch = _render_batch(task)
+                yield batch
+            return
+
+        ctx = mp.get_context("spawn")
+        with ctx.Pool(
+            processes=self.num_workers,
+            initializer=_worker_setup,
+            initargs=(self.render_cfg, self.seed, self.pack),
+        ) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.apply_async(_render_batch, (task,)))
+                if len(pending) >= self.num_workers * self.prefetch:
+                    yield pending.popleft().get()
+
+            while pending:
+                yield pending.popleft().get()
+
+    def _iter_tasks(self) -> Iterator[Tuple[int, int]]:
+        if self.num_image == -1:
+            start = 0
+            while True:
+                yield start, self.batch_size
+                start += self.batch_size
+
+        for start in range(0, self.num_image, self.batch_size):
+            yield start, min(self.batch_size, self.num_image - start)
+
+
+def stream(generator_cfg: GeneratorCfg, **kwargs) -> RenderStream:
+    """
+    Render images on the fly, see :class:`RenderStream` for arguments
+
+    .. code-block:: python
+
+        for images, labels in text_renderer.stream(generator_cfg, num_workers=8):
+            train_step(images, labels)
+    """
+    return RenderStream(generator_cfg, **kwargs)
@@ -0,0 +1,139 @@
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+def iter_chunks(num_image: int, chunk_size: int):
+    """
+    Split num_image into chunk sizes, lazily so the parent never holds one task per image
+    """
+    for start in range(0, num_image, chunk_size):
+        yield min(chunk_size, num_image - start)
+
+
+def iter_tasks(
+    num_image: int,
+    chunk_size: int,
+    exist_counts: List[int],
+    resume: bool = False,
+):
+    """
+    Assign chunks to shards in round-robin
+
+    Args:
+        num_image: number of images to generate
+        chunk_size:
+        exist_counts: exist image count of each shard
+        resume: If True, num_image is the total number of images, samples already in shards are skipped.
+            If False, num_image images are appended after exist images
+
+    Yields:
+        (shard, sample_start, index_start, count). sample_start is the index of first sample
+        in generator, used to seed each sample. index_start is the index of first sample in shard dataset
+    """
+    num_shards = len(exist_counts)
+    if resume:
+        sample_offset = 0
+        shard_pos = [0] * num_shards
+    else:
+        sample_offset = sum(exist_counts)
+        shard_pos = list(exist_counts)
+
+    for i, count in enumerate(iter_chunks(num_image, chunk_size)):
+        shard = i % num_shards
+        skip = 0
+        if resume:
+            skip = min(max(exist_counts[shard] - shard_pos[shard], 0), count)
+
+        if skip < count:
+            sample_start = sample_offset + i * chunk_size + skip
+            yield shard, sample_start, shard_pos[shard] + skip, count - skip
+        shard_pos[shard] += count
+
+
+def count_tasks(
+    num_image: int,
+    chunk_size: int,
+    exist_counts: List[int],
+    resume: bool = False,
+) -> Tuple[List[int], int]:
+    """
+    Count what iter_tasks yields without iterating the tasks
+
+    Returns:
+        (number of images to generate of each shard, number of tasks)
+    """
+    num_shards = len(exist_counts)
+    num_chunks = -(-num_image // chunk_size)
+    shard_num_images = []
+    num_tasks = 0
+    for shard in range(num_shards):
+        shard_chunks = max(0, -(-(num_chunks - shard) // num_shards))
+        total = shard_chunks * chunk_size
+        if num_chunks > 0 and (num_chunks - 1) % num_shards == shard:
+            # last chunk may be smaller
+            total -= num_chunks * chunk_size - num_image
+
+        if not resume:
+            shard_num_images.append(total)
+            num_tasks += shard_chunks
+        elif exist_counts[shard] < total:
+            shard_num_images.append(total - exist_counts[shard])
+            # chunks fully covered by exist images are skipped
+            num_tasks += shard_chunks - exist_counts[shard] // chunk_size
+        else:
+            shard_num_images.append(0)
+    return shard_num_images, num_tasks
+
+
+def interleave_tasks(generator_tasks: List[Iterable[tuple]]):
+    """
+    Take one task from each generator in turn, so all generators share the pool until the last image
+
+    Args:
+        generator_tasks: tasks of each generator, see iter_tasks
+
+    Yields:
+        (generator_idx, shard, sample_start, index_start, count)
+    """
+    iters = [(i, iter(it)) for i, it in enumerate(generator_tasks)]
+    while iters:
+        remain = []
+        for generator_idx, it in iters:
+            task = next(it, None)
+            if task is not None:
+                yield (generator_idx, *task)
+                remain.append((generator_idx, it))
+        iters = remain
+
+
+class ReorderBuffer:
+    """
+    Samples finished out of order wait here for samples with smaller "index",
+    so name of a sample does not depend on which render process finished first
+    """
+
+    def __init__(self, next_index: int = 0):
+        """
+
+        Parameters
+        ----------
+        next_index : int
+            Index of the next sample to pop
+        """
+        self.next_index = next_index
+        self._pending: Dict[int, Dict] = {}
+
+    def push(self, samples: List[Dict]):
+        for sample in samples:
+            self._pending[sample["index"]] = sample
+
+    def pop_ready(self) -> Iterator[Dict]:
+        """
+        Yields samples from next_index until a missing index
+        """
+        while self.next_index in self._pending:
+            sample = self._pending.pop(self.next_index)
+            self.next_index += 1
+            yield sample
+
+    def __len__(self):
+        return len(self._pending)
@@ -1,7 +1,19 @@
+import glob
+import json
+import multiprocessing as mp
+import os
 from tempfile import TemporaryDirectory
 import numpy as np
+import pytest
 
-from text_renderer.dataset import LmdbDataset
+from text_renderer.dataset import (
+    ImgDataset,
+    LmdbDataset,
+    MemmapDataset,
+    ShardedDataset,
+    TarDataset,
+)
+from text_renderer.utils.errors import PanicError
 
 
 def test_lmdb():
@@ -23,3 +35,221 @@ def test_lmdb():
             assert data["label"] == label
             assert data["size"] == [width, height]
             assert dataset.read_count() == 1
+
+
+def test_lmdb_write_encoded():
+    height, width = 5, 10
+    img = np.random.randint(0, 255, (height, width), dtype=np.uint8)
+    name = f"{0:09d}"
+    with TemporaryDirectory() as d:
+        with LmdbDataset(d) as dataset:
+            image_buf = LmdbDataset.encode(img)
+            dataset.write_encoded(name, image_buf, "hello", (width, height))
+            dataset.write_count(1)
+
+        with LmdbDataset(d) as dataset:
+            data = dataset.read(name)
+            assert data["image"].shape == (height, width)
+            assert data["size"] == [width, height]
+
+
+def test_lmdb_periodic_commit():
+    img = np.random.randint(0, 255, (5, 10), dtype=np.uint8)
+    with TemporaryDirectory() as d:
+        with pytest.raises(RuntimeError):
+            with LmdbDataset(d, commit_interval=2) as dataset:
+                for i in range(3):
+                    dataset.write(f"{i:09d}", img, "hello")
+                raise RuntimeError("crash before close")
+
+        with LmdbDataset(d) as dataset:
+            assert dataset.read_count() == 2
+            assert dataset.read(f"{1:09d}")["label"] == "hello"
+
+
+def test_img_dataset_journal():
+    img = np.random.randint(0, 255, (5, 10), dtype=np.uint8)
+    with TemporaryDirectory() as d:
+        with ImgDataset(d) as dataset:
+            for i in range(3):
+                dataset.write(f"{i:09d}", img, f"text{i}")
+            dataset.write_count(3)
+
+        # a line written without index entry is dropped on open
+        with open(os.path.join(d, ImgDataset.JOURNAL_NAME), "a") as f:
+            f.write('{"name": "000000003", "la')
+
+        with ImgDataset(d) as dataset:
+            assert dataset.read_count() == 3
+            assert dataset.read(f"{1:09d}")["label"] == "text1"
+            assert dataset.read_size(f"{2:09d}") == [10, 5]
+            dataset.write(f"{3:09d}", img, "text3")
+            dataset.export_labels_json()
+
+        with open(os.path.join(d, ImgDataset.LABEL_NAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        assert data["num-samples"] == 4
+        assert data["labels"]["000000003"] == "text3"
+
+
+def test_img_dataset_reader_while_writing():
+    img = np.random.randint(0, 255, (5, 10), dtype=np.uint8)
+    with TemporaryDirectory() as d:
+        with ImgDataset(d) as writer:
+            for i in range(400):
+                writer.write(f"{i:09d}", img, f"text{i}" * 10)
+                if i % 37 == 0:
+                    # journal and index are flushed at different times, reader must not drop the tail
+                    with ImgDataset(d, readonly=True) as reader:
+                        count = reader.read_count()
+                        assert count <= i + 1
+                        if count > 0:
+                            label = reader.read(f"{count - 1:09d}")["label"]
+                            assert label == f"text{count - 1}" * 10
+                        with pytest.raises(PanicError):
+                            reader.write(f"{i:09d}", img, "text")
+            writer.write_count(400)
+
+        with ImgDataset(d, readonly=True) as reader:
+            assert reader.read_count() == 400
+            assert reader.read_size(f"{399:09d}") == [10, 5]
+
+
+def test_img_dataset_import_legacy_labels():
+    with TemporaryDirectory() as d:
+        legacy = {
+            "num-samples": 2,
+            "labels": {"000000000": "a", "000000001": "b"},
+            "sizes": {"000000000": [10, 5], "000000001": [12, 5]},
+        }
+        with open(os.path.join(d, ImgDataset.LABEL_NAME), "w", encoding="utf-8") as f:
+            json.dump(legacy, f)
+
+        with ImgDataset(d) as dataset:
+            assert dataset.read_count() == 2
+            assert dataset.read_size("000000001") == [12, 5]
+
+
+def test_sharded_dataset():
+    img = np.random.randint(0, 255, (5, 10), dtype=np.uint8)
+    with TemporaryDirectory() as d:
+        for shard, num in enumerate([2, 1]):
+            shard_dir = os.path.join(d, ShardedDataset.shard_name(shard))
+            with LmdbDataset(shard_dir) as dataset:
+                for i in range(num):
+                    dataset.write(f"{i:09d}", img, f"shard{shard}-{i}")
+        ShardedDataset.write_manifest(d, LmdbDataset, 2)
+
+        with ShardedDataset(d) as dataset:
+            assert dataset.read_count() == 3
+            assert dataset.read(f"{1:09d}")["label"] == "shard0-1"
+            assert dataset.read(f"{2:09d}")["label"] == "shard1-0"
+
+
+def _write_shard(dataset_cls, shard_dir, written, resume):
+    img = np.random.randint(0, 255, (5, 10), dtype=np.uint8)
+    with dataset_cls(shard_dir) as writer:
+        for i in range(2):
+            writer.write(f"{i:09d}", img, f"text{i}")
+        writer.write_count(2)
+        if isinstance(writer, LmdbDataset):
+            writer.commit()
+        written.set()
+        resume.wait(10)
+        writer.write(f"{2:09d}", img, "text2")
+
+
+@pytest.mark.parametrize(
+    "dataset_cls", [LmdbDataset, TarDataset, MemmapDataset, ImgDataset]
+)
+def test_sharded_dataset_read_while_writing(dataset_cls):
+    ctx = mp.get_context("spawn")
+    with TemporaryDirectory() as d:
+        shard_dir = os.path.join(d, ShardedDataset.shard_name(0))
+        written, resume = ctx.Event(), ctx.Event()
+        writer = ctx.Process(
+            target=_write_shard, args=(dataset_cls, shard_dir, written, resume)
+        )
+        writer.start()
+        assert written.wait(30)
+
+        ShardedDataset.write_manifest(d, dataset_cls, 1)
+        files = {
+            it: os.path.getsize(it)
+            for it in glob.glob(os.path.join(shard_dir, "**"), recursive=True)
+        }
+        with ShardedDataset(d) as dataset:
+            assert dataset.read(f"{1:09d}")["label"] == "text1"
+        # readers change nothing and don't block the writer
+        assert files == {
+            it: os.path.getsize(it)
+            for it in glob.glob(os.path.join(shard_dir, "**"), recursive=True)
+        }
+
+        resume.set()
+        writer.join(30)
+        assert writer.exitcode == 0
+        with dataset_cls(shard_dir, readonly=True) as dataset:
+            assert dataset.read_count() == 3
+
+
+def test_tar_dataset():
+    img = np.random.randint(0, 255, (5, 10), dtype=np.uint8)
+    with TemporaryDirectory() as d:
+        with TarDataset(d, max_shard_size=1) as dataset:
+            for i in range(3):
+                dataset.write(f"{i:09d}", img, f"text{i}")
+
+        with TarDataset(d) as dataset:
+            assert dataset.read_count() == 3
+            assert len(glob.glob(os.path.join(d, "*.tar"))) == 3
+            data = dataset.read(f"{2:09d}")
+            assert data["label"] == "text2"
+            assert data["size"] == [10, 5]
+
+
+def test_memmap_dataset():
+    imgs = [
+        np.random.randint(0, 255, (32, width), dtype=np.uint8) for width in [10, 7, 12]
+    ]
+    with TemporaryDirectory() as d:
+        with MemmapDataset(d) as dataset:
+            for i, img in enumerate(imgs):
+                dataset.write(f"{i:09d}", img, f"text{i}")
+            with pytest.raises(PanicError):
+                dataset.write("000000003", np.zeros((16, 5), np.uint8), "text3")
+            dataset.write_count(3)
+
+        with MemmapDataset(d) as dataset:
+            assert dataset.read_count() == 3
+            data = dataset.read(f"{1:09d}")
+            assert np.array_equal(data["image"], imgs[1])
+            assert data["label"] == "text1"
+            assert data["size"] == [7, 32]
+
+
+def test_memmap_dataset_recover():
+    imgs = [
+        np.random.randint(0, 255, (8, width, 3), dtype=np.uint8) for width in [4, 6, 5]
+    ]
+    with TemporaryDirectory() as d:
+        dataset = MemmapDataset(d)
+        for i, img in enumerate(imgs):
+            dataset.write(f"{i:09d}", img, f"text{i}")
+        # process killed before write_count/close, last image is partially written
+        dataset._flush()
+        with open(os.path.join(d, MemmapDataset.PIXELS_NAME), "rb+") as f:
+            f.truncate(os.path.getsize(f.name) - 1)
+        with open(os.path.join(d, MemmapDataset.LABELS_NAME), "ab") as f:
+            f.write(b'"text')
+
+        with MemmapDataset(d) as dataset:
+            assert dataset.read_count() == 2
+            assert np.array_equal(dataset.read(f"{1:09d}")["image"], imgs[1])
+            dataset.write(f"{2:09d}", imgs[2], "text2")
+
+        with MemmapDataset(d) as dataset:
+            assert dataset.read_count() == 3
+            data = dataset.read(f"{2:09d}")
+            assert np.array_equal(data["image"], imgs[2])
+            assert data["label"] == "text2"
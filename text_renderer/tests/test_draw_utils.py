@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from text_renderer.utils.draw_utils import draw_text_on_bg
+from text_renderer.utils.font_text import FontText
+
+CURRENT_DIR = Path(os.path.abspath(os.path.dirname(__file__)))
+FONT_PATH = str(
+    CURRENT_DIR.parent.parent / "example_data" / "font" / "calibri_regular.ttf"
+)
+
+
+@pytest.mark.parametrize("horizontal", [True, False])
+@pytest.mark.parametrize("char_spacing", [0.1, -0.3, (0, 0.5)])
+def test_glyph_cache_same_as_pillow(horizontal, char_spacing):
+    font = ImageFont.truetype(FONT_PATH, 30)
+    font_text = FontText(font, "Hello, 你好", FONT_PATH, horizontal)
+    text_color = (10, 100, 200, 180)
+
+    np.random.seed(0)
+    cached = draw_text_on_bg(font_text, text_color, char_spacing, use_glyph_cache=True)
+    np.random.seed(0)
+    drawn = draw_text_on_bg(font_text, text_color, char_spacing, use_glyph_cache=False)
+
+    cached = np.array(cached)
+    drawn = np.array(drawn)
+    assert np.array_equal(cached, drawn)
+
+
+@pytest.mark.parametrize("text", ["Hello, world", "gjpqy", "'"])
+def test_font_text_metrics(text):
+    font = ImageFont.truetype(FONT_PATH, 30)
+
+    offset = font.getoffset(text)
+    left, top, right, bottom = font.getmask(text).getbbox()
+    font_text = FontText(font, text, FONT_PATH)
+    assert font_text.offset == offset
+    assert font_text.xy == (-offset[0] - left, -offset[1])
+    assert font_text.size == (right - left, font.getsize(text)[1] - offset[1])
+
+    vertical = FontText(font, text, FONT_PATH, horizontal=False)
+    width = max([font.getsize(c)[0] - font.getoffset(c)[0] for c in text])
+    height = sum([font.getsize(c)[1] for c in text]) - font.getoffset(text[0])[1]
+    assert vertical.size == (height, width)
+
+
+def test_draw_horizontal_text_same_as_pillow():
+    font = ImageFont.truetype(FONT_PATH, 30)
+    font_text = FontText(font, "Hello, world", FONT_PATH)
+    text_color = (10, 100, 200, 180)
+
+    drawn = Image.new("RGBA", font_text.size, (255, 255, 255, 0))
+    ImageDraw.Draw(drawn).text(font_text.xy, font_text.text, text_color, font)
+    drawn = np.array(drawn)
+    text_mask = draw_text_on_bg(font_text, text_color)
+    # effects draw on text mask
+    assert not text_mask.readonly
+    text_mask = np.array(text_mask)
+
+    assert np.array_equal(text_mask, drawn)
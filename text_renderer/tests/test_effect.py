@@ -0,0 +1,155 @@
+import imgaug.augmenters as iaa
+import numpy as np
+from PIL import Image
+
+from text_renderer.effect import (
+    DropoutHorizontal,
+    DropoutRand,
+    DropoutVertical,
+    Effects,
+    ImgAugEffect,
+    Line,
+    OneOf,
+    Padding,
+)
+from text_renderer.effect.curve import Curve, _remap_grid
+from text_renderer.utils.bbox import BBox
+
+
+def text_mask(width=200, height=40, value=200):
+    np_img = np.zeros((height, width, 4), dtype=np.uint8)
+    # left half is text, right half is transparent
+    np_img[:, : width // 2] = value
+    return np_img
+
+
+def test_dropout_rand():
+    np.random.seed(0)
+    np_img = text_mask()
+    img = Image.fromarray(np_img)
+
+    out, bbox = DropoutRand(p=1, dropout_p=(0.3, 0.3)).apply(
+        img, BBox.from_size(img.size)
+    )
+    out = np.array(out)
+
+    assert bbox == BBox.from_size(img.size)
+    # transparent pixels are never dropped
+    assert np.array_equal(out[:, 100:], np_img[:, 100:])
+
+    changed = np.any(out != np_img, axis=-1)
+    assert changed.sum() == int(40 * 100 * 0.3)
+    # each channel is uniform on [0, value]
+    dropped = out[changed].astype(np.float64)
+    assert dropped.max() <= 200
+    assert abs(dropped.mean() - 100) < 3
+
+
+def test_dropout_rand_not_contiguous():
+    np_img = np.ascontiguousarray(text_mask().transpose(1, 0, 2)).transpose(1, 0, 2)
+    assert not np_img.flags.c_contiguous
+    origin = np_img.copy()
+
+    out, _ = DropoutRand(p=1, dropout_p=(0.3, 0.3)).apply_array(
+        np_img, BBox(0, 0, 200, 40)
+    )
+    # changed in place
+    assert out is np_img
+    assert np.any(out[..., :3] != origin[..., :3], axis=-1).sum() > 0
+    assert np.array_equal(out[:, 100:], origin[:, 100:])
+
+
+def test_dropout_lines_on_array():
+    np_img = np.full((40, 200, 4), 200, dtype=np.uint8)
+    bbox = BBox(0, 0, 200, 40)
+
+    out, _ = DropoutHorizontal(p=1, num_line=2, thickness=3).apply_array(
+        np_img.copy(), bbox
+    )
+    rows = np.all(out[:, :, :3] <= 20, axis=(1, 2))
+    assert 3 <= rows.sum() <= 6
+    assert np.array_equal(out[~rows], np_img[~rows])
+    # all channels of a pixel have the same value
+    assert np.all(out[rows] == out[rows][..., :1])
+
+    out, _ = DropoutVertical(p=1, num_line=2, thickness=3).apply_array(np_img, bbox)
+    # array input is changed in place
+    assert out is np_img
+    cols = np.all(out[:, :, :3] <= 20, axis=(0, 2))
+    assert 3 <= cols.sum() <= 6
+
+
+def test_curve():
+    np_img = text_mask()
+    bbox = BBox(0, 5, 200, 35)
+    # amplitude is always rounded to 4
+    curve = Curve(p=1, period=180, amplitude=(4, 4.01))
+
+    out, out_bbox = curve.apply(Image.fromarray(np_img), bbox)
+    assert out.size == (200, 40)
+    # text rows are moved up and down by the amplitude
+    assert out_bbox == BBox(0, 0, 200, 36)
+    # output image is writable
+    out.putpixel((0, 0), (0, 0, 0, 0))
+
+    # grids of the same size are reused
+    info = _remap_grid.cache_info()
+    curve.apply_array(np_img, bbox)
+    assert _remap_grid.cache_info().hits == info.hits + 1
+
+
+def test_effects_array_pipeline():
+    np_img = text_mask()
+    bbox = BBox.from_size((200, 40))
+    effects = Effects(
+        [
+            DropoutHorizontal(p=1),
+            OneOf([DropoutRand(p=1), DropoutVertical(p=1)]),
+            Padding(p=1, w_ratio=(0.1, 0.2)),
+        ]
+    )
+    assert effects.array_native and effects.inplace
+
+    out, _ = effects.apply_effects(np_img, bbox)
+    assert isinstance(out, np.ndarray) and out.shape[1] >= 220
+    # input array is copied before inplace effects
+    assert np.array_equal(np_img, text_mask())
+
+    # effect which is not array native converts array to PIL image and back
+    effects = Effects([DropoutHorizontal(p=1), Line(p=1), DropoutVertical(p=1)])
+    assert not effects.array_native
+    out, _ = effects.apply_effects(Image.fromarray(np_img), bbox)
+    assert isinstance(out, Image.Image)
+    out.putpixel((0, 0), (0, 0, 0, 0))
+
+
+def test_imgaug_effect_apply_batch():
+    imgs = [text_mask(width=w) for w in (100, 100, 150)]
+    bboxes = [BBox.from_size((w, 40)) for w in (100, 100, 150)]
+    expected = [np.minimum(it.astype(int) + 20, 255) for it in imgs]
+
+    for pad_batch in (False, True):
+        effect = ImgAugEffect(p=1, aug=iaa.Add(20), pad_batch=pad_batch)
+        out, out_bboxes = effect.apply_batch([it.copy() for it in imgs], bboxes)
+        assert out_bboxes == bboxes
+        for it, exp in zip(out, expected):
+            assert np.array_equal(it, exp)
+            assert it.flags.c_contiguous
+
+
+def test_effects_apply_batch():
+    np.random.seed(0)
+    imgs = [text_mask(width=w) for w in (100, 150, 200, 250)]
+    bboxes = [BBox.from_size((it.shape[1], it.shape[0])) for it in imgs]
+    effects = Effects(
+        [
+            OneOf([ImgAugEffect(p=1, aug=iaa.Add(20)), DropoutVertical(p=1)]),
+            Padding(p=1, w_ratio=(0.1, 0.2)),
+        ]
+    )
+
+    out, out_bboxes = effects.apply_batch(imgs, bboxes)
+    assert len(out) == len(out_bboxes) == 4
+    for it, img, bbox in zip(out, imgs, out_bboxes):
+        assert it.shape[1] >= img.shape[1] * 1.1 - 1
+        assert bbox.size == (img.shape[1], img.shape[0])
@@ -0,0 +1,78 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from text_renderer import font_manager as font_manager_module
+from text_renderer.font_manager import FontManager
+
+CURRENT_DIR = Path(os.path.abspath(os.path.dirname(__file__)))
+EXAMPLE_DATA_DIR = CURRENT_DIR.parent.parent / "example_data"
+FONT_DIR = EXAMPLE_DATA_DIR / "font"
+CHARS_FILE = EXAMPLE_DATA_DIR / "char" / "eng.txt"
+
+
+def test_font_cache(monkeypatch):
+    with TemporaryDirectory() as cache_dir:
+        font_manager = FontManager(FONT_DIR, None, (20, 30), Path(cache_dir))
+        font_manager.update_font_support_chars(CHARS_FILE)
+        assert len(os.listdir(cache_dir)) == len(font_manager.font_paths)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("should be loaded from cache")
+
+        monkeypatch.setattr(FontManager, "_parse_font_support_chars", fail)
+        monkeypatch.setattr(font_manager_module, "_find_empty_chars", fail)
+        cached = FontManager(FONT_DIR, None, (20, 30), Path(cache_dir))
+        cached.update_font_support_chars(CHARS_FILE)
+
+        assert cached.font_support_chars_cache == font_manager.font_support_chars_cache
+        assert (
+            cached.font_support_chars_intersection_with_chars
+            == font_manager.font_support_chars_intersection_with_chars
+        )
+
+
+def test_font_cache_invalidated_by_mtime(monkeypatch):
+    with TemporaryDirectory() as cache_dir, TemporaryDirectory() as font_dir:
+        src = next(FONT_DIR.glob("*.ttf"))
+        font_path = Path(font_dir) / src.name
+        font_path.write_bytes(src.read_bytes())
+
+        FontManager(Path(font_dir), None, (20, 30), Path(cache_dir))
+        stat = os.stat(font_path)
+        os.utime(font_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        parsed = []
+        parse = FontManager._parse_font_support_chars
+
+        def count_parse(self, path):
+            parsed.append(path)
+            return parse(self, path)
+
+        monkeypatch.setattr(FontManager, "_parse_font_support_chars", count_parse)
+        FontManager(Path(font_dir), None, (20, 30), Path(cache_dir))
+        assert parsed == [str(font_path)]
+
+
+def test_parallel_update_font_support_chars():
+    serial = FontManager(FONT_DIR, None, (20, 30), cache_dir=None)
+    serial.update_font_support_chars(CHARS_FILE)
+
+    parallel = FontManager(FONT_DIR, None, (20, 30), cache_dir=None)
+    parallel.update_font_support_chars(CHARS_FILE, num_workers=2)
+
+    assert parallel.font_support_chars_cache == serial.font_support_chars_cache
+
+
+def test_font_cache_not_writable():
+    with TemporaryDirectory() as d:
+        # parent of cache_dir is a file, so cache_dir can not be created
+        not_dir = Path(d) / "file"
+        not_dir.write_text("")
+        font_manager = FontManager(FONT_DIR, None, (20, 30), not_dir / "fonts")
+        font_manager.update_font_support_chars(CHARS_FILE)
+
+        serial = FontManager(FONT_DIR, None, (20, 30), cache_dir=None)
+        serial.update_font_support_chars(CHARS_FILE)
+        assert font_manager.font_support_chars_cache == serial.font_support_chars_cache
+        assert os.listdir(d) == ["file"]
@@ -0,0 +1,91 @@
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+
+from text_renderer.corpus import EnumCorpus, EnumCorpusCfg, LazyCorpus
+from text_renderer.font_manager import FontFaceCache, FontManager
+from text_renderer.utils.errors import PanicError, RetryError
+
+CURRENT_DIR = Path(os.path.abspath(os.path.dirname(__file__)))
+FONT_DIR = CURRENT_DIR.parent.parent / "example_data" / "font"
+
+
+def test_get_font_support_text():
+    font_manager = FontManager(FONT_DIR, None, (20, 30), cache_dir=None)
+    text = "你好"
+
+    font_paths = font_manager.get_support_font_paths(text)
+    assert font_paths == [
+        p
+        for p in font_manager.font_paths
+        if set(text) <= font_manager.font_support_chars_cache[p]
+    ]
+    assert 0 < len(font_paths) < len(font_manager.font_paths)
+
+    for _ in range(10):
+        _, support_chars, font_path = font_manager.get_font(text)
+        assert font_path in font_paths
+
+    with pytest.raises(RetryError):
+        font_manager.get_font("\U0001f600")
+
+
+def test_sample_no_font_support():
+    corpus = EnumCorpus(
+        EnumCorpusCfg(
+            items=["\U0001f600"],
+            font_dir=FONT_DIR,
+            font_size=(20, 30),
+            font_cache_dir=None,
+        )
+    )
+    with pytest.raises(PanicError, match="No font supports"):
+        corpus.sample()
+
+
+def test_lazy_corpus():
+    cfg = EnumCorpusCfg(
+        items=["hello", "world"],
+        font_dir=FONT_DIR,
+        font_size=(20, 30),
+        font_cache_dir=None,
+    )
+    corpus = EnumCorpus.lazy(cfg)
+    assert isinstance(corpus, LazyCorpus)
+    # corpus is not loaded at construction
+    assert corpus._corpus is None
+    assert corpus.cfg is cfg
+
+    font_text = corpus.sample()
+    assert font_text.text in cfg.items
+    assert isinstance(corpus._corpus, EnumCorpus)
+    # attributes are forwarded to the loaded corpus
+    assert corpus.texts == cfg.items
+    assert corpus.font_manager is corpus.corpus.font_manager
+    with pytest.raises(AttributeError):
+        corpus._not_exist
+
+    # only class and cfg are pickled, loaded corpus is not
+    data = pickle.dumps(corpus)
+    assert b"FontManager" not in data
+    corpus = pickle.loads(data)
+    assert corpus._corpus is None
+    assert corpus.cfg.items == cfg.items
+    assert corpus.sample().text in cfg.items
+
+
+def test_font_face_cache():
+    cache = FontFaceCache(maxsize=2)
+    font_path = str(next(FONT_DIR.glob("*.ttf")))
+
+    font = cache.get(font_path, 20)
+    assert cache.get(font_path, 20) is font
+    cache.get(font_path, 21)
+    cache.get(font_path, 22)
+    assert cache.cache_info() == (1, 3, 2, 2)
+
+    # size 20 is least recently used and has been evicted
+    assert cache.get(font_path, 20) is not font
+    assert cache.cache_info().misses == 4
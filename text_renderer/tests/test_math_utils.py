@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+from text_renderer.config import NormPerspectiveTransformCfg
+from text_renderer.utils.math_utils import PerspectiveTransform
+
+
+def test_do_warp_perspective():
+    np.random.seed(0)
+    np_img = np.random.randint(0, 255, (40, 300, 4), dtype=np.uint8)
+    transformer = PerspectiveTransform(NormPerspectiveTransformCfg(20, 20, 1.5))
+
+    dst, pnts = transformer.do_warp_perspective(Image.fromarray(np_img))
+    assert dst.size == transformer.get_transformed_size((300, 40))
+
+    # same as warping into the whole sl x sl square and cropping the rect
+    x, y, w, h = transformer.get_transformed_rect((300, 40))
+    full = cv2.warpPerspective(
+        np_img,
+        transformer.M33,
+        (transformer.sl, transformer.sl),
+        flags=cv2.INTER_CUBIC,
+        borderValue=(255, 255, 255, 0),
+    )
+    expected = full[y : y + h, x : x + w]
+    assert np.array_equal(np.array(dst), expected)
+    assert pnts.min() >= 0
+
+    # output image is writable
+    dst.putpixel((0, 0), (0, 0, 0, 0))
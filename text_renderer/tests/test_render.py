@@ -0,0 +1,67 @@
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from text_renderer.bg_manager import get_bg_mean
+from text_renderer.config import RenderCfg
+from text_renderer.corpus import EnumCorpus, EnumCorpusCfg
+from text_renderer.effect import Effect, Effects
+from text_renderer.render import Render, RenderBatch
+
+CURRENT_DIR = Path(os.path.abspath(os.path.dirname(__file__)))
+EXAMPLE_DATA_DIR = CURRENT_DIR.parent.parent / "example_data"
+
+
+def test_render_batch_pack():
+    images = [np.full((32, w, 3), w, dtype=np.uint8) for w in (10, 30, 20)]
+    batch = RenderBatch.pack(images, ["a", "b", "c"])
+
+    assert len(batch) == 3
+    assert batch.images is None
+    assert batch.tensor.shape == (3, 32, 30, 3)
+    assert batch.widths.tolist() == [10, 30, 20]
+    # padded with 0
+    assert not batch.tensor[0, :, 10:].any()
+    for image, unpacked in zip(images, batch.unpack()):
+        assert np.array_equal(image, unpacked)
+
+    batch = RenderBatch.pack([], [])
+    assert len(batch) == 0 and batch.unpack() == []
+
+
+def test_get_bg_mean():
+    bg = Image.new("RGBA", (8, 8), (10, 20, 30, 255))
+    assert get_bg_mean(bg) == get_bg_mean(bg) == np.mean([10, 20, 30, 255])
+
+
+class BatchFailEffect(Effect):
+    array_native = True
+
+    def apply_array(self, np_img, text_bbox):
+        return np_img, text_bbox
+
+    def apply_batch(self, imgs, text_bboxes):
+        raise ValueError("batch failed")
+
+
+def test_render_batch_effects_fallback():
+    render = Render(
+        RenderCfg(
+            bg_dir=EXAMPLE_DATA_DIR / "bg",
+            corpus=EnumCorpus(
+                EnumCorpusCfg(
+                    items=["hello", "world"],
+                    font_dir=EXAMPLE_DATA_DIR / "font",
+                    font_size=(20, 30),
+                    font_cache_dir=None,
+                )
+            ),
+            render_effects=Effects([BatchFailEffect(p=1)]),
+            batch_render_effects=True,
+        )
+    )
+    batch = render.render_batch(3)
+    assert len(batch.images) == len(batch.labels) == 3
+    assert all(label in ("hello", "world") for label in batch.labels)
@@ -0,0 +1,132 @@
+import os
+import random
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from text_renderer.config import GeneratorCfg, RenderCfg
+from text_renderer.corpus import EnumCorpus, EnumCorpusCfg
+from text_renderer import streaming
+from text_renderer.streaming import RenderStream
+
+CURRENT_DIR = Path(os.path.abspath(os.path.dirname(__file__)))
+EXAMPLE_DATA_DIR = CURRENT_DIR.parent.parent / "example_data"
+
+
+def get_generator_cfg(num_image=5):
+    return GeneratorCfg(
+        num_image=num_image,
+        save_dir=None,
+        render_cfg=RenderCfg(
+            bg_dir=EXAMPLE_DATA_DIR / "bg",
+            corpus=EnumCorpus(
+                EnumCorpusCfg(
+                    items=["hello", "world", "text renderer"],
+                    font_dir=EXAMPLE_DATA_DIR / "font",
+                    font_size=(20, 30),
+                    font_cache_dir=None,
+                )
+            ),
+        ),
+    )
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_stream_batch_size(num_workers):
+    stream = RenderStream(
+        get_generator_cfg(), num_workers=num_workers, batch_size=2, seed=1
+    )
+    batches = list(stream)
+
+    # last batch is truncated to num_image
+    assert [len(labels) for _, labels in batches] == [2, 2, 1]
+    for images, labels in batches:
+        assert len(images) == len(labels)
+        assert all(image.shape[0] == 32 for image in images)
+
+
+def test_stream_num_image():
+    stream = RenderStream(get_generator_cfg(), num_workers=0, batch_size=4, num_image=6)
+    assert [len(labels) for _, labels in stream] == [4, 2]
+
+
+def test_stream_seed():
+    def render(num_workers, batch_size):
+        stream = RenderStream(
+            get_generator_cfg(),
+            num_workers=num_workers,
+            batch_size=batch_size,
+            seed=7,
+        )
+        return [
+            (image, label)
+            for images, labels in stream
+            for image, label in zip(images, labels)
+        ]
+
+    expected = render(0, 2)
+    for images in [render(0, 2), render(2, 3)]:
+        assert [label for _, label in images] == [label for _, label in expected]
+        for (image, _), (expected_image, _) in zip(images, expected):
+            assert np.array_equal(image, expected_image)
+
+
+def test_stream_pack():
+    stream = RenderStream(
+        get_generator_cfg(), num_workers=0, batch_size=2, seed=1, pack=True
+    )
+    batches = list(stream)
+    assert len(batches) == 3
+
+    for tensor, widths, labels in batches:
+        assert tensor.dtype == np.uint8
+        assert tensor.shape == (len(labels), 32, widths.max())
+        for image, width in zip(tensor, widths):
+            # padded with 0 on the right
+            assert not image[:, width:].any()
+
+
+@pytest.mark.parametrize("seed", [None, 3])
+def test_stream_keeps_global_random_state(seed):
+    import imgaug as ia
+
+    def draw():
+        return (
+            random.random(),
+            np.random.rand(),
+            ia.random.get_global_rng().integers(1000),
+        )
+
+    # imgaug creates its global generator from np.random on first use, seed it first
+    ia.seed(0)
+    random.seed(0)
+    np.random.seed(0)
+    expected = [draw()]
+
+    ia.seed(0)
+    random.seed(0)
+    np.random.seed(0)
+    for _ in RenderStream(get_generator_cfg(), num_workers=0, batch_size=2, seed=seed):
+        pass
+    assert [draw()] == expected
+
+
+def test_stream_dataloader_workers(monkeypatch):
+    def render(worker_info):
+        monkeypatch.setattr(streaming, "_get_worker_info", lambda: worker_info)
+        stream = RenderStream(
+            get_generator_cfg(num_image=8), num_workers=0, batch_size=2, seed=5
+        )
+        return [images for images, _ in stream]
+
+    expected = render(None)
+    workers = [render(SimpleNamespace(id=i, num_workers=2)) for i in range(2)]
+
+    # workers yield different batches, together they are the whole stream
+    assert len(workers[0]) == len(workers[1]) == 2
+    for i, images in enumerate(expected):
+        for image, expected_image in zip(workers[i % 2][i // 2], images):
+            assert np.array_equal(image, expected_image)
+    assert not np.array_equal(workers[0][0][0], workers[1][0][0])
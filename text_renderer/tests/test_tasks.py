@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from text_renderer.tasks import (
+    ReorderBuffer,
+    count_tasks,
+    interleave_tasks,
+    iter_tasks,
+)
+
+
+@pytest.mark.parametrize("resume", [False, True])
+@pytest.mark.parametrize(
+    "num_image, chunk_size, exist_counts",
+    [
+        (0, 4, [0]),
+        (10, 4, [0]),
+        (10, 4, [3]),
+        (10, 4, [12]),
+        (25, 8, [0, 0, 0]),
+        (25, 8, [8, 3, 0]),
+        (25, 8, [9, 17, 1]),
+        (7, 8, [0, 0, 0]),
+        (40, 8, [16, 16, 8]),
+    ],
+)
+def test_count_tasks(num_image, chunk_size, exist_counts, resume):
+    tasks = list(iter_tasks(num_image, chunk_size, exist_counts, resume))
+    shard_num_images, num_tasks = count_tasks(
+        num_image, chunk_size, exist_counts, resume
+    )
+    assert num_tasks == len(tasks)
+    for shard, num in enumerate(shard_num_images):
+        assert num == sum(it[3] for it in tasks if it[0] == shard)
+
+
+def test_iter_tasks_resume():
+    # chunks of 8 images: shard 0, 1, 2, then 1 image in shard 0
+    exist_counts = [9, 3, 0]
+    assert list(iter_tasks(25, 8, exist_counts, resume=False)) == [
+        (0, 12, 9, 8),
+        (1, 20, 3, 8),
+        (2, 28, 0, 8),
+        (0, 36, 17, 1),
+    ]
+    # samples already in shards are skipped, each sample keeps its index in generator
+    assert list(iter_tasks(25, 8, exist_counts, resume=True)) == [
+        (1, 11, 3, 5),
+        (2, 16, 0, 8),
+    ]
+
+
+def test_interleave_tasks():
+    generator_tasks = [
+        [("a", 0), ("a", 1), ("a", 2)],
+        [("b", 0)],
+        [("c", 0), ("c", 1)],
+    ]
+    tasks = list(interleave_tasks(generator_tasks))
+    assert tasks == [
+        (0, "a", 0),
+        (1, "b", 0),
+        (2, "c", 0),
+        (0, "a", 1),
+        (2, "c", 1),
+        (0, "a", 2),
+    ]
+    assert list(interleave_tasks(generator_tasks)) == tasks
+
+
+def test_reorder_buffer():
+    samples = [{"index": i} for i in range(5, 25)]
+    chunks = [samples[i : i + 3] for i in range(0, len(samples), 3)]
+    random.Random(0).shuffle(chunks)
+
+    buffer = ReorderBuffer(5)
+    received = []
+    for chunk in chunks:
+        buffer.push(chunk)
+        received.extend(it["index"] for it in buffer.pop_ready())
+    assert received == list(range(5, 25))
+    assert len(buffer) == 0
+
+    # samples after a missing index are not popped
+    buffer.push([{"index": 26}])
+    assert list(buffer.pop_ready()) == []
+    assert len(buffer) == 1
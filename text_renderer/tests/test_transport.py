@@ -0,0 +1,139 @@
+import multiprocessing as mp
+import threading
+
+import numpy as np
+import pytest
+
+from text_renderer.transport import ShmRingTransport, shared_memory
+from text_renderer.utils.errors import PanicError
+
+pytestmark = pytest.mark.skipif(
+    shared_memory is None, reason="ShmRingTransport requires python >= 3.8"
+)
+
+
+def make_samples(num: int, start: int = 0, width: int = 10):
+    return [
+        {
+            "image": np.random.randint(0, 255, (4, width + i), dtype=np.uint8),
+            "label": f"text{start + i}",
+            "index": start + i,
+        }
+        for i in range(num)
+    ]
+
+
+def assert_samples_equal(received, sent):
+    assert [it["index"] for it in received] == [it["index"] for it in sent]
+    for r, s in zip(received, sent):
+        assert r["label"] == s["label"]
+        assert r["image"].dtype == s["image"].dtype
+        assert np.array_equal(r["image"], s["image"])
+
+
+def get_all(transport, num: int):
+    received = []
+    while len(received) < num:
+        received.extend(transport.get())
+    return received
+
+
+def _put_then_exit(transport, samples):
+    transport.put(samples)
+
+
+def test_round_trip():
+    transport = ShmRingTransport(num_slots=4, slot_size=1024, slot_timeout=5)
+    try:
+        samples = make_samples(3)
+        samples.append(
+            {"image": np.random.rand(4, 5).astype(np.float32), "label": "", "index": 3}
+        )
+        transport.put(samples)
+        received = get_all(transport, len(samples))
+        assert_samples_equal(received, samples)
+        assert all("slot" not in it for it in received)
+
+        # all slots are back to the ring
+        transport.put(make_samples(4))
+        assert len(get_all(transport, 4)) == 4
+    finally:
+        transport.close()
+
+
+def test_ring_full_flush():
+    transport = ShmRingTransport(num_slots=2, slot_size=1024)
+    try:
+        # chunk larger than the ring, put only returns if metadata of held slots is sent before waiting
+        samples = make_samples(7)
+        putter = threading.Thread(target=transport.put, args=(samples,))
+        putter.start()
+        received = get_all(transport, len(samples))
+        putter.join(10)
+        assert not putter.is_alive()
+        assert_samples_equal(received, samples)
+    finally:
+        transport.close()
+
+
+def test_slot_timeout():
+    transport = ShmRingTransport(num_slots=1, slot_size=1024, slot_timeout=0.1)
+    try:
+        # nobody frees slots, e.g. DBWriterProcess died
+        with pytest.raises(PanicError):
+            transport.put(make_samples(2))
+    finally:
+        transport.close()
+
+
+def test_inline_fallback():
+    transport = ShmRingTransport(num_slots=1, slot_size=64)
+    try:
+        samples = make_samples(1, width=100) + make_samples(1, start=1)
+        transport.put(samples)
+        # large image does not hold the only slot
+        transport.put(make_samples(1, start=2, width=100))
+        received = get_all(transport, 3)
+        assert_samples_equal(received[:2], samples)
+        assert received[2]["image"].shape == (4, 100)
+    finally:
+        transport.close()
+
+
+def test_shared_ring():
+    ring = ShmRingTransport(num_slots=2, slot_size=1024)
+    other = ShmRingTransport(ring=ring)
+    try:
+        assert other.num_slots == 2 and other.slot_size == 1024
+        samples = make_samples(1)
+        other_samples = make_samples(1, start=1)
+        ring.put(samples)
+        other.put(other_samples)
+        # each transport has its own metadata pipe
+        assert_samples_equal(other.get(), other_samples)
+        assert_samples_equal(ring.get(), samples)
+
+        # only owner releases shared memory
+        other.close()
+        ring.put(samples)
+        assert_samples_equal(ring.get(), samples)
+    finally:
+        ring.close()
+
+
+def test_stop_after_last_chunk():
+    # queues of transport are created with the default start method, use the same one for render process
+    transport = ShmRingTransport(num_slots=8, slot_size=1024)
+    try:
+        samples = make_samples(5)
+        # render process exits right after put, stop token is put by main process after that
+        process = mp.Process(target=_put_then_exit, args=(transport, samples))
+        process.start()
+        process.join(30)
+        assert process.exitcode == 0
+        transport.put_stop()
+
+        assert_samples_equal(get_all(transport, len(samples)), samples)
+        assert transport.get() is None
+    finally:
+        transport.close()
@@ -0,0 +1,179 @@
+import multiprocessing as mp
+import queue
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from text_renderer.utils.errors import PanicError
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+STOP_TOKEN = "kill"
+
+
+class Transport:
+    """
+    Send rendered samples from render processes to DBWriterProcess.
+
+    A sample is a dict contains at least "image" and "label", samples are always sent in chunks(list).
+    """
+
+    def put(self, samples: List[Dict]):
+        pass
+
+    def get(self) -> Optional[List[Dict]]:
+        """
+        Returns:
+            List[Dict]: samples put by render process, None if stop token received
+        """
+        pass
+
+    def put_stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class QueueTransport(Transport):
+    """
+    Send samples through a ``multiprocessing.Manager().Queue()``, samples are pickled by the manager
+    """
+
+    def __init__(self, manager):
+        self._queue = manager.Queue()
+
+    def put(self, samples: List[Dict]):
+        self._queue.put(samples)
+
+    def get(self) -> Optional[List[Dict]]:
+        samples = self._queue.get()
+        if samples == STOP_TOKEN:
+            return None
+        return samples
+
+    def put_stop(self):
+        self._queue.put(STOP_TOKEN)
+
+
+class ShmRingTransport(Transport):
+    """
+    Render process writes image pixels into a free slot of a shared memory ring buffer,
+    only (slot, shape, dtype, label) metadata is sent through a pipe.
+    Image larger than slot_size is sent inline with metadata.
+
+    Slots are returned to the ring as soon as DBWriterProcess copied the image out.
+
+    Transports created with ``ring`` share the ring buffer of another transport, each of them
+    has its own metadata pipe, so multiple DBWriterProcess can use one ring buffer.
+    """
+
+    def __init__(
+        self,
+        num_slots: int = 256,
+        slot_size: int = 256 * 1024,
+        ring: Optional["ShmRingTransport"] = None,
+        slot_timeout: float = 600,
+    ):
+        """
+
+        Parameters
+        ----------
+        num_slots : int
+            Number of slots in ring buffer
+        slot_size : int
+            Max bytes of one image
+        ring : ShmRingTransport
+            If not None, use ring buffer of this transport, num_slots and slot_size are ignored.
+            The ring buffer is released when ``ring`` is closed
+        slot_timeout : float
+            Seconds to wait for a free slot before raising PanicError,
+            so render process does not wait forever if DBWriterProcess died
+        """
+        if shared_memory is None:
+            raise PanicError("ShmRingTransport requires python >= 3.8")
+
+        if ring is None:
+            self.num_slots = num_slots
+            self.slot_size = slot_size
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=num_slots * slot_size
+            )
+            self._free_slots = mp.Queue()
+            for i in range(num_slots):
+                self._free_slots.put(i)
+        else:
+            self.num_slots = ring.num_slots
+            self.slot_size = ring.slot_size
+            self._shm = ring._shm
+            self._free_slots = ring._free_slots
+        self._owner = ring is None
+        self.slot_timeout = slot_timeout
+        # SimpleQueue writes to the pipe before put returns, so metadata put by render process
+        # always arrives before the stop token put by main process after the task finished.
+        # mp.Queue sends in a feeder thread, the stop token could overtake the last chunk
+        self._meta_queue = mp.SimpleQueue()
+
+    def put(self, samples: List[Dict]):
+        metas = []
+        for sample in samples:
+            image = np.ascontiguousarray(sample["image"])
+            meta = {k: v for k, v in sample.items() if k != "image"}
+            if image.nbytes <= self.slot_size:
+                slot = self._acquire_slot(metas)
+                self._slot_view(slot, image.shape, image.dtype)[...] = image
+                meta.update(slot=slot, shape=image.shape, dtype=image.dtype.str)
+            else:
+                meta["image"] = image
+            metas.append(meta)
+
+        if metas:
+            self._meta_queue.put(metas)
+
+    def get(self) -> Optional[List[Dict]]:
+        metas = self._meta_queue.get()
+        if metas == STOP_TOKEN:
+            return None
+
+        for meta in metas:
+            if "slot" in meta:
+                slot = meta.pop("slot")
+                view = self._slot_view(
+                    slot, meta.pop("shape"), np.dtype(meta.pop("dtype"))
+                )
+                meta["image"] = view.copy()
+                del view
+                self._free_slots.put(slot)
+        return metas
+
+    def put_stop(self):
+        self._meta_queue.put(STOP_TOKEN)
+
+    def close(self):
+        if self._owner:
+            self._shm.close()
+            self._shm.unlink()
+
+    def _acquire_slot(self, pending: List[Dict]) -> int:
+        try:
+            return self._free_slots.get_nowait()
+        except queue.Empty:
+            # Ring is full: send metadata of slots held by this chunk first,
+            # otherwise all render processes may wait for slots which writer can not free
+            if pending:
+                self._meta_queue.put(list(pending))
+                pending.clear()
+            try:
+                return self._free_slots.get(timeout=self.slot_timeout)
+            except queue.Empty:
+                raise PanicError(
+                    f"No free slot in {self.slot_timeout}s, DBWriterProcess may have died"
+                )
+
+    def _slot_view(self, slot: int, shape, dtype) -> np.ndarray:
+        return np.ndarray(
+            shape, dtype=dtype, buffer=self._shm.buf, offset=slot * self.slot_size
+        )
@@ -1,10 +1,19 @@
-from typing import Tuple, Union
+from typing import List, Tuple, Union
 
+import PIL
 from PIL import ImageDraw, Image
 from PIL.Image import Image as PILImage
 import numpy as np
 
 from text_renderer.utils.font_text import FontText
+from text_renderer.utils.glyph_cache import Glyph, glyph_cache
+from text_renderer.utils.utils import to_pil_image
+
+# How Pillow fills text color on a transparent RGBA image, see fill_mask_L in libImaging/Paste.c:
+# before 7.2 color is blended with the background by mask like alpha,
+# before 8.3 color is set on the whole mask box over transparent pixels,
+# since 8.3 color is set on transparent pixels where mask is not zero
+_PILLOW_VERSION = tuple(int(it) for it in PIL.__version__.split(".")[:2])
 
 
 def transparent_img(size: Tuple[int, int]) -> PILImage:
@@ -23,6 +32,7 @@ def draw_text_on_bg(
     font_text: FontText,
     text_color: Tuple[int, int, int, int] = (0, 0, 0, 255),
     char_spacing: Union[float, Tuple[float, float]] = -1,
+    use_glyph_cache: bool = True,
 ) -> PILImage:
     """
 
@@ -34,6 +44,9 @@ def draw_text_on_bg(
     char_spacing : Union[float, Tuple[float, float]]
         Draw character with spacing. If tuple, random choice between [min, max)
         Set -1 to disable
+    use_glyph_cache : bool
+        When text is drawn char by char(char_spacing is set or vertical text), paste cached char masks
+        instead of drawing each char with Pillow. Set False for fonts need shaping or color fonts
 
     Returns
     -------
@@ -52,8 +65,14 @@ def draw_text_on_bg(
     widths = []
     heights = []
 
+    glyphs = []
     for c in font_text.text:
-        size = font_text.font.getsize(c)
+        if use_glyph_cache:
+            glyph = glyph_cache.get(font_text.font, c)
+            glyphs.append(glyph)
+            size = glyph.size
+        else:
+            size = font_text.font.getsize(c)
         chars_size.append(size)
         widths.append(size[0])
         heights.append(size[1])
@@ -80,6 +99,11 @@ def draw_text_on_bg(
     else:
         height += sum(char_spacings[:-1])
 
+    if use_glyph_cache:
+        return _paste_glyphs(
+            font_text, glyphs, chars_size, char_spacings, (width, height), text_color
+        )
+
     text_mask = transparent_img((width, height))
     draw = ImageDraw.Draw(text_mask)
 
@@ -101,12 +125,107 @@ def draw_text_on_bg(
     return text_mask
 
 
+def _paste_glyphs(
+    font_text: FontText,
+    glyphs: List[Glyph],
+    chars_size: List[Tuple[int, int]],
+    char_spacings: List[int],
+    size: Tuple[int, int],
+    text_color: Tuple[int, int, int, int],
+) -> PILImage:
+    """
+    Same as drawing each char with ``ImageDraw.text`` on a transparent image,
+    alpha of chars are composited in a numpy buffer
+    """
+    width, height = size
+    alpha, rgb = _transparent_buffers(height, width)
+
+    c_x = 0
+    c_y = 0
+    if font_text.horizontal:
+        c_y -= font_text.offset[1]
+    else:
+        c_x -= font_text.offset[0]
+
+    for i, glyph in enumerate(glyphs):
+        _blend_mask(
+            alpha,
+            rgb,
+            glyph.mask,
+            (c_x + glyph.offset[0], c_y + glyph.offset[1]),
+            text_color,
+        )
+
+        if font_text.horizontal:
+            c_x += chars_size[i][0] + char_spacings[i]
+        else:
+            c_y += chars_size[i][1] + char_spacings[i]
+
+    text_mask = _to_rgba(alpha, rgb)
+    if not font_text.horizontal:
+        text_mask = np.rot90(text_mask)
+
+    return to_pil_image(text_mask)
+
+
+def _transparent_buffers(height: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns:
+        alpha and rgb buffers of a transparent image, same as :func:`transparent_img`
+    """
+    alpha = np.zeros((height, width), dtype=np.int32)
+    rgb = np.full((height, width, 3), 255, dtype=np.int32)
+    return alpha, rgb
+
+
+def _blend(dst: np.ndarray, color, mask: np.ndarray) -> np.ndarray:
+    # BLEND in libImaging/ImagingUtils.h, rounded division by 255
+    tmp = dst * (255 - mask) + np.asarray(color, dtype=np.int32) * mask + 128
+    return ((tmp >> 8) + tmp) >> 8
+
+
+def _blend_mask(
+    alpha: np.ndarray,
+    rgb: np.ndarray,
+    mask: np.ndarray,
+    xy: Tuple[int, int],
+    text_color: Tuple[int, int, int, int],
+):
+    """
+    Fill text_color by mask pasted at xy, same as Pillow fills a mask on a transparent RGBA image.
+    Mask outside of alpha is clipped
+    """
+    x, y = xy
+    height, width = alpha.shape
+    mask_h, mask_w = mask.shape
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + mask_w, width), min(y + mask_h, height)
+    if x0 < x1 and y0 < y1:
+        mask = mask[y0 - y : y1 - y, x0 - x : x1 - x].astype(np.int32)
+        dst_rgb = rgb[y0:y1, x0:x1]
+        if _PILLOW_VERSION < (7, 2):
+            dst_rgb[...] = _blend(dst_rgb, text_color[:3], mask[..., None])
+        elif _PILLOW_VERSION < (8, 3):
+            # pixels already drawn have text color
+            dst_rgb[...] = text_color[:3]
+        else:
+            dst_rgb[mask > 0] = text_color[:3]
+        alpha[y0:y1, x0:x1] = _blend(alpha[y0:y1, x0:x1], text_color[3], mask)
+
+
+def _to_rgba(alpha: np.ndarray, rgb: np.ndarray) -> np.ndarray:
+    text_mask = np.empty((*alpha.shape, 4), dtype=np.uint8)
+    text_mask[..., :3] = rgb
+    text_mask[..., 3] = alpha
+    return text_mask
+
+
 def _draw_text_on_bg(
     font_text: FontText,
     text_color: Tuple[int, int, int, int] = (0, 0, 0, 255),
 ) -> PILImage:
     """
-    Draw text
+    Draw text, the mask rasterized by FontText is reused
 
     Parameters
     ----------
@@ -120,18 +239,16 @@ def _draw_text_on_bg(
             RGBA Pillow image with text on a transparent image
     """
     text_width, text_height = font_text.size
-    text_mask = transparent_img((text_width, text_height))
-    draw = ImageDraw.Draw(text_mask)
+    alpha, rgb = _transparent_buffers(text_height, text_width)
 
     xy = font_text.xy
-
-    # TODO: figure out anchor
-    draw.text(
-        xy,
-        font_text.text,
-        font=font_text.font,
-        fill=text_color,
-        anchor=None,
+    mask, mask_offset = font_text.mask
+    _blend_mask(
+        alpha,
+        rgb,
+        mask,
+        (xy[0] + mask_offset[0], xy[1] + mask_offset[1]),
+        text_color,
     )
 
-    return text_mask
+    return to_pil_image(_to_rgba(alpha, rgb))
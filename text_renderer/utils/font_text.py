@@ -1,24 +1,54 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
 
+import numpy as np
 from PIL.ImageFont import FreeTypeFont
 
+from text_renderer.utils.glyph_cache import glyph_cache, mask_to_array
+
 
 @dataclass
 class FontText:
+    """
+    Text and font to draw. Metrics are measured once on first access and memoized,
+    text and font should not be changed after that.
+    """
+
     font: FreeTypeFont
     text: str
     font_path: str
     horizontal: bool = True
 
+    # memoized by _measure() and _rasterize()
+    _offset: Optional[Tuple[int, int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _size: Optional[Tuple[int, int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _xy: Optional[Tuple[int, int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _mask: Optional[np.ndarray] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _mask_offset: Optional[Tuple[int, int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _bbox: Optional[Tuple[int, int, int, int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
     @property
     def xy(self):
-        offset = self.font.getoffset(self.text)
-        left, top, right, bottom = self.font.getmask(self.text).getbbox()
-        return 0 - offset[0] - left, 0 - offset[1]
+        self._rasterize()
+        return self._xy
 
     @property
     def offset(self):
-        return self.font.getoffset(self.text)
+        if self._offset is None:
+            self._offset = self.font.getoffset(self.text)
+        return self._offset
 
     @property
     def size(self) -> [int, int]:
@@ -28,15 +58,43 @@ class FontText:
         Returns:
             width, height
         """
+        self._measure()
+        return self._size
+
+    @property
+    def mask(self) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Text rasterized in one line, drawing text at xy pastes the mask at xy + mask offset
+
+        Returns:
+            (height, width) uint8 alpha mask, mask offset
+        """
+        self._rasterize()
+        return self._mask, self._mask_offset
+
+    def _measure(self):
+        if self._size is not None:
+            return
+
         if self.horizontal:
-            offset = self.font.getoffset(self.text)
             size = self.font.getsize(self.text)
-            width = size[0] - offset[0]
-            height = size[1] - offset[1]
-            left, top, right, bottom = self.font.getmask(self.text).getbbox()
-            return right - left, height
+            height = size[1] - self.offset[1]
+            left, top, right, bottom = self._rasterize()
+            self._size = right - left, height
         else:
-            widths = [self.font.getsize(c)[0] - self.font.getoffset(c)[0] for c in self.text]
-            width = max(widths)
-            height = sum([self.font.getsize(c)[1] for c in self.text]) - self.font.getoffset(self.text[0])[1]
-            return height, width
+            glyphs = [glyph_cache.get(self.font, c) for c in self.text]
+            width = max([it.size[0] - it.offset[0] for it in glyphs])
+            height = sum([it.size[1] for it in glyphs]) - glyphs[0].offset[1]
+            self._size = height, width
+
+    def _rasterize(self) -> Tuple[int, int, int, int]:
+        """
+        Returns:
+            bbox of the mask
+        """
+        if self._mask is None:
+            mask, self._mask_offset = self.font.getmask2(self.text, "L")
+            self._mask = mask_to_array(mask)
+            self._bbox = mask.getbbox()
+            self._xy = 0 - self.offset[0] - self._bbox[0], 0 - self.offset[1]
+        return self._bbox
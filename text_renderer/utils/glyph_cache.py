@@ -0,0 +1,63 @@
+import os
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+from PIL.ImageFont import FreeTypeFont
+
+from text_renderer.utils.lru_cache import LRUCache
+
+
+@dataclass
+class Glyph:
+    """
+    Rasterized char
+
+    Attributes:
+        mask: (height, width) uint8 alpha mask
+        offset: position of mask relative to the draw origin, same as ``FreeTypeFont.getmask2``
+        size: (width, height) of the char, same as ``FreeTypeFont.getsize``
+    """
+
+    mask: np.ndarray
+    offset: Tuple[int, int]
+    size: Tuple[int, int]
+
+
+def mask_to_array(mask) -> np.ndarray:
+    """
+    Convert mask returned by ``FreeTypeFont.getmask2`` to a (height, width) uint8 array.
+    bytearray copies pixels through the sequence protocol of the image core object,
+    which is faster than numpy reading the pixels one by one
+    """
+    width, height = mask.size
+    return np.frombuffer(bytearray(mask), dtype=np.uint8).reshape(height, width)
+
+
+class GlyphCache(LRUCache):
+    """
+    LRU cache of :class:`Glyph` keyed by (font_path, font_size, char), one per process.
+    Used by :func:`~text_renderer.utils.draw_utils.draw_text_on_bg` to draw text char by char
+    without rasterizing the same char again.
+    """
+
+    def __init__(self, maxsize: int = 65536):
+        super().__init__(maxsize)
+
+    def get(self, font: FreeTypeFont, char: str) -> Glyph:
+        return self.get_or_create(
+            (font.path, font.size, char), lambda: self._rasterize(font, char)
+        )
+
+    @staticmethod
+    def _rasterize(font: FreeTypeFont, char: str) -> Glyph:
+        mask, offset = font.getmask2(char, "L")
+        return Glyph(
+            mask=mask_to_array(mask),
+            offset=offset,
+            size=font.getsize(char),
+        )
+
+
+# Set TEXT_RENDERER_GLYPH_CACHE_SIZE to change the size
+glyph_cache = GlyphCache(int(os.environ.get("TEXT_RENDERER_GLYPH_CACHE_SIZE", 65536)))
@@ -0,0 +1,56 @@
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Hashable
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class LRUCache:
+    """
+    Least recently used cache with the same ``cache_info`` as ``functools.lru_cache``,
+    for values whose key is not the arguments of a function, or whose size changes at runtime.
+    """
+
+    def __init__(self, maxsize: int):
+        """
+
+        Parameters
+        ----------
+        maxsize : int
+            Max number of values. Least recently used value is dropped when exceeded
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get_or_create(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        """
+        Returns cached value of key, call create() to get the value if key is not cached
+        """
+        value = self._values.get(key)
+        if value is not None:
+            self.hits += 1
+            self._values.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = create()
+        self._values[key] = value
+        self._evict()
+        return value
+
+    def resize(self, maxsize: int):
+        self.maxsize = maxsize
+        self._evict()
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._values))
+
+    def cache_clear(self):
+        self._values.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self):
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
@@ -6,8 +6,6 @@ import numpy as np
 import cv2
 import math
 
-from PIL import Image
-
 from text_renderer.config import PerspectiveTransformCfg
 from text_renderer.utils import utils
 
@@ -66,6 +64,8 @@ class PerspectiveTransform(object):
         self.x, self.y, self.z = cfg.get_xyz()
         self.scale = cfg.scale
         self.fovy = cfg.fovy
+        # image size of current M33
+        self._warp_size = None
 
     def get_transformed_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
         """
@@ -73,54 +73,63 @@ class PerspectiveTransform(object):
             size: (width, height)
 
         Returns:
-            (width, height)
+            (width, height) of image output by do_warp_perspective
+        """
+        _, _, width, height = self.get_transformed_rect(size)
+        return width, height
+
+    def get_transformed_rect(self, size: Tuple[int, int]) -> Tuple[int, int, int, int]:
         """
-        width, height = size
-        _, _, _, text_box_pnts_transformed = self.gen_warp_matrix(width, height)
+        Bounding rect of the transformed image corners in the sl x sl square of the warp matrix
+
+        Args:
+            size: (width, height)
 
-        transformed_bbox = cv2.boundingRect(text_box_pnts_transformed)
-        bbox_width = transformed_bbox[2]
-        bbox_height = transformed_bbox[3]
+        Returns:
+            (x, y, width, height)
+        """
+        M33 = self.get_warp_matrix(*size)
+        transformed_pnts = self.transform_pnts(utils.size_to_pnts(size), M33)
+        return tuple(cv2.boundingRect(transformed_pnts))
 
-        return int(bbox_width), int(bbox_height)
+    def get_warp_matrix(self, width: int, height: int) -> np.ndarray:
+        """
+        M33 of image size, generated once per size
+        """
+        if self._warp_size != (width, height):
+            self.gen_warp_matrix(width, height)
+            self._warp_size = (width, height)
+        return self.M33
 
     def do_warp_perspective(self, pil_img):
         """
+        Warp image straight into the bounding rect of its transformed corners,
+        pixels outside of the rect are never computed
 
         Args:
             pil_img:
 
         Returns:
-
+            warped image, transformed corners relative to the warped image
         """
+        x, y, width, height = self.get_transformed_rect(pil_img.size)
         text_box_pnts = utils.size_to_pnts(pil_img.size)
         img = np.array(pil_img).astype(np.uint8)
 
+        # fold translation of the rect to origin into the warp matrix
+        T = np.array([[1, 0, -x], [0, 1, -y], [0, 0, 1]], dtype=np.float64)
         dst = cv2.warpPerspective(
             img,
-            self.M33,
-            (self.sl, self.sl),
+            T @ self.M33,
+            (width, height),
             flags=cv2.INTER_CUBIC,
             borderValue=(255, 255, 255, 0),
         )
         transformed_pnts = self.transform_pnts(text_box_pnts, self.M33)
+        transformed_pnts[:, 0] -= x
+        transformed_pnts[:, 1] -= y
 
-        transformed_text_box = cv2.boundingRect(transformed_pnts)
-        transformed_text_box = list(transformed_text_box)
-        dst = Image.fromarray(dst)
-        dst = dst.crop(
-            [
-                transformed_text_box[0],
-                transformed_text_box[1],
-                transformed_text_box[0] + transformed_text_box[2],
-                transformed_text_box[1] + transformed_text_box[3],
-            ]
-        )
-
-        transformed_pnts[:, 0] -= transformed_text_box[0]
-        transformed_pnts[:, 1] -= transformed_text_box[1]
-
-        return dst, transformed_pnts
+        return utils.to_pil_image(dst), transformed_pnts
 
     def transform_pnts(self, pnts, M33):
         """
@@ -131,7 +140,7 @@ class PerspectiveTransform(object):
         pnts = np.asarray(pnts, dtype=np.float32)
         pnts = np.array([pnts])
         dst_pnts = cv2.perspectiveTransform(pnts, M33)[0]
-        return np.array(dst_pnts).astype(np.int)
+        return np.array(dst_pnts).astype(np.int32)
 
     def get_warped_pnts(self, ptsIn, ptsOut, W, H, sidelength):
         ptsIn2D = ptsIn[0, :]
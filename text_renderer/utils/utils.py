@@ -1,9 +1,12 @@
 import random
+import sys
 from typing import Tuple, Set
 
 import cv2
 import numpy as np
 from loguru import logger
+from PIL import Image
+from PIL.Image import Image as PILImage
 from text_renderer.utils.errors import PanicError
 
 SPACE_CHAR = " "
@@ -19,6 +22,59 @@ def prob(percent):
     return False
 
 
+def seed_sample(seed: int, generator_idx: int, sample_idx: int):
+    """
+    Seed numpy, python and imgaug random generators for one sample,
+    so a sample is rendered the same no matter which process renders it
+    """
+    # imgaug is slow to import, only pay for it when samples are seeded
+    import imgaug as ia
+
+    state = np.random.SeedSequence([seed, generator_idx, sample_idx]).generate_state(1)
+    state = int(state[0])
+    # imgaug creates its global generator from np.random on first use, so seed it first
+    ia.seed(state)
+    np.random.seed(state)
+    random.seed(state)
+
+
+def get_random_state() -> Tuple:
+    """
+    Returns states of python, numpy and imgaug global random generators.
+    imgaug state is None if its global generator is not created yet
+    """
+    ia_state = None
+    iarandom = sys.modules.get("imgaug.random")
+    # don't create imgaug global generator here, creating it draws from np.random
+    if iarandom is not None and iarandom.GLOBAL_RNG is not None:
+        ia_state = iarandom.GLOBAL_RNG.state
+    return random.getstate(), np.random.get_state(), ia_state
+
+
+def set_random_state(state: Tuple):
+    """
+    Restore states returned by get_random_state
+    """
+    py_state, np_state, ia_state = state
+    random.setstate(py_state)
+    np.random.set_state(np_state)
+    iarandom = sys.modules.get("imgaug.random")
+    if iarandom is not None:
+        if ia_state is None:
+            # created again from np.random on next use
+            iarandom.GLOBAL_RNG = None
+        else:
+            iarandom.get_global_rng().set_state_(ia_state)
+
+
+def to_pil_image(np_img: np.ndarray) -> PILImage:
+    """
+    Image.fromarray shares memory with the array and the image is readonly,
+    copy it so effects can draw on it
+    """
+    return Image.fromarray(np_img).copy()
+
+
 def random_choice(items, size=1):
     # np.random.choice is very slow
     out = []
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from typing import List
 
@@ -5,6 +6,7 @@ from typer import Typer, Option
 from rich import print
 from rich.table import Table
 
+from text_renderer.font_cache import DEFAULT_FONT_CACHE_DIR
 from text_renderer.font_manager import FontManager
 from text_renderer.utils.utils import load_chars_file
 
@@ -13,11 +15,12 @@ app = Typer()
 
 @app.command()
 def main(font_dir: Path = Option(...), font_list_file: Path = Option(None), char_path: Path = Option(...),
-         thresh: int = Option(-1)):
+         thresh: int = Option(-1), num_workers: int = Option(os.cpu_count(), help="0 checks fonts in current process"),
+         cache_dir: Path = Option(DEFAULT_FONT_CACHE_DIR, help="Persistent font cache directory")):
     chars = set(load_chars_file(char_path))
     print(f"{char_path} chars: {len(chars)}")
-    font_manager = FontManager(font_dir, font_list_file, font_size=(20, 21))
-    font_manager.update_font_support_chars(char_path)
+    font_manager = FontManager(font_dir, font_list_file, font_size=(20, 21), cache_dir=cache_dir)
+    font_manager.update_font_support_chars(char_path, num_workers=num_workers)
 
     table = Table()
     table.add_column('font')
@@ -0,0 +1,20 @@
+import fire
+
+from text_renderer.dataset import ImgDataset
+
+
+def img_labels2json(input: str, output: str = None):
+    """
+    Convert labels.jsonl journal of ImgDataset to legacy labels.json
+
+    Args:
+        input: data_dir of ImgDataset
+        output: default is labels.json in input directory
+    """
+    with ImgDataset(input, readonly=True) as db:
+        db.export_labels_json(output)
+        print(f"Convert {db.read_count()} labels")
+
+
+if __name__ == "__main__":
+    fire.Fire(img_labels2json)